@@ -0,0 +1,75 @@
+import time
+from collections import OrderedDict
+from copy import copy
+from hashlib import sha256
+from threading import Lock
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+
+from .cache import get_stamps
+
+
+def token_stamp(key):
+    return f'token:{sha256(key.encode()).hexdigest()}'
+
+
+class TokenLRU:
+    """Ограниченный по размеру и времени жизни кэш токенов воркера."""
+
+    def __init__(self, size, ttl):
+        self.size, self.ttl = size, ttl
+        self.entries = OrderedDict()
+        self.lock = Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+
+local_tokens = TokenLRU(
+    settings.AUTH_TOKEN_CACHE_SIZE, settings.AUTH_TOKEN_CACHE_TTL)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication без запроса к БД для уже известных токенов.
+
+    Пара токен — пользователь хранится в памяти воркера и, если включён
+    AUTH_TOKEN_SHARED_CACHE, в общем кэше. Запись действительна, пока
+    не изменилась отметка токена; её обновляют выход, смена пароля
+    и любое сохранение пользователя.
+    """
+
+    def authenticate_credentials(self, key):
+        stamp_name = token_stamp(key)
+        stamp, = get_stamps([stamp_name])
+        entry = local_tokens.get(key)
+        if entry is None and settings.AUTH_TOKEN_SHARED_CACHE:
+            entry = cache.get(stamp_name + ':user')
+        if entry is None or entry[2] != stamp:
+            user, token = super().authenticate_credentials(key)
+            entry = (user, token, stamp)
+            if settings.AUTH_TOKEN_SHARED_CACHE:
+                cache.set(
+                    stamp_name + ':user', entry,
+                    settings.AUTH_TOKEN_CACHE_TTL,
+                )
+        local_tokens.set(key, entry)
+        user, token, _ = entry
+        return copy(user), token
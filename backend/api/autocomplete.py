@@ -0,0 +1,93 @@
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from recipes.models import Ingredients
+
+from .cache import get_stamps
+
+TRIGRAM_THRESHOLD = 0.3
+
+ingredient_index = {'stamp': None, 'index': None}
+
+
+def normalize(value):
+    return value.lower().replace('ё', 'е').strip()
+
+
+def trigrams(value, padded=True):
+    if padded:
+        value = f'  {value} '
+    return {value[i:i + 3] for i in range(len(value) - 2)}
+
+
+class IngredientIndex:
+    """Индекс ингредиентов для автодополнения по названию.
+
+    Сначала ищет по отсортированному списку названий совпадения
+    с начала строки, затем добирает результаты по общим триграммам.
+    """
+
+    def __init__(self, rows):
+        self.rows = [
+            {'id': pk, 'name': name, 'measurement_unit': unit}
+            for pk, name, unit in rows
+        ]
+        names = [normalize(row['name']) for row in self.rows]
+        self.sorted = sorted(
+            (name, position) for position, name in enumerate(names))
+        self.keys = [name for name, _ in self.sorted]
+        self.trigrams = defaultdict(list)
+        for position, name in enumerate(names):
+            for trigram in trigrams(name):
+                self.trigrams[trigram].append(position)
+        self.names = names
+
+    def prefix_matches(self, query, limit):
+        found = []
+        index = bisect_left(self.keys, query)
+        while index < len(self.keys) and len(found) < limit:
+            name, position = self.sorted[index]
+            if not name.startswith(query):
+                break
+            found.append(position)
+            index += 1
+        return found
+
+    def trigram_matches(self, query, limit, exclude):
+        query_trigrams = trigrams(query, padded=len(query) < 3)
+        shared = Counter()
+        for trigram in query_trigrams:
+            shared.update(self.trigrams.get(trigram, ()))
+        scored = [
+            (-count / len(query_trigrams), self.names[position], position)
+            for position, count in shared.items()
+            if position not in exclude
+            and count / len(query_trigrams) >= TRIGRAM_THRESHOLD
+        ]
+        scored.sort()
+        return [position for _, _, position in scored[:limit]]
+
+    def search(self, query, limit=None):
+        limit = limit or settings.INGREDIENT_AUTOCOMPLETE_LIMIT
+        query = normalize(query)
+        if not query:
+            return []
+        found = self.prefix_matches(query, limit)
+        if len(found) < limit:
+            found += self.trigram_matches(
+                query, limit - len(found), set(found))
+        return [self.rows[position] for position in found]
+
+
+def get_ingredient_index():
+    """Возвращает индекс воркера, перестраивая его после изменения
+    справочника ингредиентов."""
+    stamp, = get_stamps(['ingredients'])
+    if ingredient_index['stamp'] != stamp:
+        ingredient_index['index'] = IngredientIndex(
+            Ingredients.objects.order_by().values_list(
+                'id', 'name', 'measurement_unit')
+        )
+        ingredient_index['stamp'] = stamp
+    return ingredient_index['index']
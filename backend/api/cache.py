@@ -0,0 +1,168 @@
+import time
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from recipes.models import Tag
+from users.models import Subscription
+
+LOCK_POLL_INTERVAL = 0.05
+
+tag_ids = {'stamp': None, 'ids': {}}
+
+
+def version_key(pk):
+    return f'recipe-version:{pk}'
+
+
+def payload_key(pk, version):
+    return f'recipe:{pk}:{version}'
+
+
+def lock_key(key):
+    return f'{key}:lock'
+
+
+def get_versions(pks):
+    keys = {version_key(pk): pk for pk in pks}
+    versions = {
+        keys[key]: version for key, version in cache.get_many(keys).items()
+    }
+    for pk in set(pks) - set(versions):
+        cache.add(version_key(pk), uuid4().hex, None)
+        versions[pk] = cache.get(version_key(pk))
+    return versions
+
+
+def stamp_key(name):
+    return f'stamp:{name}'
+
+
+def user_stamp(pk):
+    return f'user:{pk}'
+
+
+def get_stamps(names):
+    """Возвращает время последнего изменения для каждого набора данных."""
+    keys = [stamp_key(name) for name in names]
+    stamps = cache.get_many(keys)
+    for key in set(keys) - set(stamps):
+        cache.add(key, time.time(), None)
+        stamps[key] = cache.get(key)
+    return [stamps[key] for key in keys]
+
+
+def touch(*names):
+    """Отмечает наборы данных изменёнными сразу и ещё раз после фиксации
+    транзакции, чтобы данные, прочитанные до фиксации, не остались
+    под новой отметкой."""
+    def set_stamps():
+        cache.set_many(
+            {stamp_key(name): time.time() for name in names}, None)
+
+    set_stamps()
+    transaction.on_commit(set_stamps)
+
+
+def get_tag_ids():
+    """Возвращает словарь slug -> id тегов, хранящийся в памяти воркера.
+
+    Словарь перечитывается из БД только после изменения тегов.
+    """
+    stamp, = get_stamps(['tag'])
+    if tag_ids['stamp'] != stamp:
+        tag_ids['ids'] = dict(Tag.objects.values_list('slug', 'id'))
+        tag_ids['stamp'] = stamp
+    return tag_ids['ids']
+
+
+def get_subscribed_ids(request):
+    """Возвращает множество id авторов, на которых подписан пользователь.
+
+    Множество загружается один раз за запрос и кэшируется по отметке
+    пользователя, которая меняется при каждой подписке или отписке.
+    """
+    if not hasattr(request, 'subscribed_ids'):
+        user = request.user
+        if user.is_anonymous:
+            request.subscribed_ids = frozenset()
+            return request.subscribed_ids
+        stamp, = get_stamps([user_stamp(user.pk)])
+        key = f'subscribed:{user.pk}:{stamp}'
+        subscribed_ids = cache.get(key)
+        if subscribed_ids is None:
+            subscribed_ids = frozenset(
+                Subscription.objects.filter(user=user).values_list(
+                    'author', flat=True)
+            )
+            cache.set(
+                key, subscribed_ids, settings.SUBSCRIPTIONS_CACHE_TIMEOUT)
+        request.subscribed_ids = subscribed_ids
+    return request.subscribed_ids
+
+
+def invalidate_recipes(pks):
+    """Меняет версии рецептов после фиксации транзакции."""
+    pks = list(pks)
+    if pks:
+        transaction.on_commit(lambda: cache.set_many(
+            {version_key(pk): uuid4().hex for pk in pks}, None,
+        ))
+        touch('recipes')
+
+
+def wait_for(keys):
+    deadline = time.monotonic() + settings.RECIPE_CACHE_LOCK_TIMEOUT
+    found = {}
+    while True:
+        found.update(cache.get_many(set(keys) - set(found)))
+        if len(found) == len(keys) or time.monotonic() >= deadline:
+            return found
+        time.sleep(LOCK_POLL_INTERVAL)
+
+
+def get_recipe_payloads(recipes, build):
+    """Возвращает представления рецептов, не зависящие от пользователя.
+
+    Отсутствующие в кэше представления собирает `build` одним вызовом
+    на список рецептов. Версии читаются позже переданных строк, поэтому
+    `build` должен перечитать рецепты из БД. Пока один запрос
+    пересобирает запись, остальные ждут её появления в кэше, а не
+    собирают её параллельно.
+    """
+    versions = get_versions([recipe.pk for recipe in recipes])
+    keys = {
+        recipe.pk: payload_key(recipe.pk, versions[recipe.pk])
+        for recipe in recipes
+    }
+    payloads = cache.get_many(keys.values())
+    locked, waiting = [], []
+    for recipe in recipes:
+        if keys[recipe.pk] in payloads:
+            continue
+        if cache.add(
+            lock_key(keys[recipe.pk]), 1,
+            settings.RECIPE_CACHE_LOCK_TIMEOUT,
+        ):
+            locked.append(recipe)
+        else:
+            waiting.append(recipe)
+    if locked:
+        try:
+            built = dict(zip(
+                (keys[recipe.pk] for recipe in locked), build(locked)))
+            cache.set_many(built, settings.RECIPE_CACHE_TIMEOUT)
+            payloads.update(built)
+        finally:
+            cache.delete_many(
+                [lock_key(keys[recipe.pk]) for recipe in locked])
+    if waiting:
+        payloads.update(wait_for([keys[recipe.pk] for recipe in waiting]))
+        expired = [
+            recipe for recipe in waiting if keys[recipe.pk] not in payloads
+        ]
+        if expired:
+            payloads.update(zip(
+                (keys[recipe.pk] for recipe in expired), build(expired)))
+    return [payloads[keys[recipe.pk]] for recipe in recipes]
@@ -0,0 +1,97 @@
+import csv
+import json
+from tempfile import SpooledTemporaryFile
+
+from django.http import FileResponse, StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+EXPORT_SPOOL_SIZE = 1024 * 1024
+
+
+class Echo:
+    """Буфер для csv.writer, который сразу возвращает записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def export_txt(rows):
+    for row in rows:
+        yield (
+            f'{row["name"]} - '
+            f'{row["amount"]} '
+            f'{row["measurement_unit"]}\r\n'
+        )
+
+
+def export_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('name', 'measurement_unit', 'amount'))
+    for row in rows:
+        yield writer.writerow(
+            (row['name'], row['measurement_unit'], row['amount']))
+
+
+def export_json(rows):
+    separator = '['
+    for row in rows:
+        yield separator + json.dumps({
+            'name': row['name'],
+            'measurement_unit': row['measurement_unit'],
+            'amount': row['amount'],
+        }, ensure_ascii=False)
+        separator = ','
+    yield '[]' if separator == '[' else ']'
+
+
+class ExportRenderer(BaseRenderer):
+    """Выбирает формат выгрузки; сам рендерит только ответы с ошибками."""
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            data = data.get('detail', data)
+        return str(data).encode(self.charset)
+
+
+class PlainTextRenderer(ExportRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+
+class CSVRenderer(ExportRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+EXPORT_RENDERERS = (PlainTextRenderer, CSVRenderer, JSONRenderer)
+
+EXPORT_FORMATS = {
+    'txt': ('text/plain', export_txt),
+    'csv': ('text/csv', export_csv),
+    'json': ('application/json', export_json),
+}
+
+
+def is_asgi(request):
+    return getattr(request, 'scope', None) is not None
+
+
+def export_response(request, rows, export_format):
+    """Отдаёт выгрузку строк queryset в выбранном формате.
+
+    Под WSGI строки читаются из курсора по мере отправки ответа. Под ASGI
+    Django 3.2 перебирает потоковый ответ в цикле событий, где запросы
+    к БД запрещены, поэтому выгрузка сначала пишется во временный файл:
+    до EXPORT_SPOOL_SIZE в памяти, дальше на диск.
+    """
+    content_type, export = EXPORT_FORMATS[export_format]
+    content_type = f'{content_type}; charset=utf-8'
+    content = export(rows.iterator())
+    if not is_asgi(request):
+        return StreamingHttpResponse(content, content_type=content_type)
+    spool = SpooledTemporaryFile(max_size=EXPORT_SPOOL_SIZE)
+    for part in content:
+        spool.write(part.encode())
+    spool.seek(0)
+    return FileResponse(spool, content_type=content_type)
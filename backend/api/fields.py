@@ -0,0 +1,123 @@
+import binascii
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from drf_extra_fields.fields import Base64ImageField
+from PIL import Image
+from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
+
+# кратно 4, чтобы порции base64 декодировались независимо
+BASE64_CHUNK_SIZE = 64 * 1024
+
+IMAGE_FORMATS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif'}
+
+
+class BulkManyRelatedField(serializers.ManyRelatedField):
+    """Загружает все объекты списка одним запросом IN."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+        child = self.child_relation
+        pks = [child.to_pk(item) for item in data]
+        objects = child.get_queryset().in_bulk(set(pks))
+        for pk in pks:
+            if pk not in objects:
+                child.fail('does_not_exist', pk_value=pk)
+        return [objects[pk] for pk in pks]
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """PrimaryKeyRelatedField, который с many=True проверяет весь
+    список одним запросом вместо запроса на каждый элемент."""
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BulkManyRelatedField(**list_kwargs)
+
+    def to_pk(self, data):
+        if self.pk_field is not None:
+            data = self.pk_field.to_internal_value(data)
+        try:
+            if isinstance(data, bool):
+                raise TypeError
+            return self.get_queryset().model._meta.pk.to_python(data)
+        except (TypeError, ValueError, ValidationError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+
+class StreamingBase64ImageField(Base64ImageField):
+    """Base64ImageField, который декодирует изображение порциями
+    во временный файл и проверяет только заголовок изображения.
+
+    Кроме строки из тела запроса в памяти держится одна порция
+    BASE64_CHUNK_SIZE; размер файла и число пикселей ограничены
+    настройками IMAGE_UPLOAD_MAX_BYTES и IMAGE_UPLOAD_MAX_PIXELS.
+    """
+    TOO_LARGE_MESSAGE = 'Размер изображения больше {limit} байт.'
+    TOO_MANY_PIXELS_MESSAGE = 'Изображение больше {limit} пикселей.'
+
+    def to_internal_value(self, base64_data):
+        if base64_data in self.EMPTY_VALUES:
+            return None
+        if not isinstance(base64_data, str):
+            raise ValidationError(self.INVALID_FILE_MESSAGE)
+        start = base64_data.find(';base64,')
+        start = 0 if start < 0 else start + len(';base64,')
+        limit = settings.IMAGE_UPLOAD_MAX_BYTES
+        if (len(base64_data) - start) // 4 * 3 > limit + 2:
+            raise ValidationError(self.TOO_LARGE_MESSAGE.format(limit=limit))
+        upload = TemporaryUploadedFile(
+            str(uuid4()), 'application/octet-stream', 0, None)
+        try:
+            upload.size = self.decode(base64_data, start, upload)
+            image_format = self.check_header(upload)
+        except Exception:
+            upload.close()
+            raise
+        upload.name = f'{upload.name}.{IMAGE_FORMATS[image_format]}'
+        upload.content_type = Image.MIME[image_format]
+        return upload
+
+    def decode(self, base64_data, start, upload):
+        size, rest = 0, ''
+        for position in range(start, len(base64_data), BASE64_CHUNK_SIZE):
+            chunk = rest + ''.join(
+                base64_data[position:position + BASE64_CHUNK_SIZE].split())
+            usable = len(chunk) - len(chunk) % 4
+            chunk, rest = chunk[:usable], chunk[usable:]
+            try:
+                decoded = binascii.a2b_base64(chunk)
+            except binascii.Error:
+                raise ValidationError(self.INVALID_FILE_MESSAGE)
+            size += len(decoded)
+            if size > settings.IMAGE_UPLOAD_MAX_BYTES:
+                raise ValidationError(self.TOO_LARGE_MESSAGE.format(
+                    limit=settings.IMAGE_UPLOAD_MAX_BYTES))
+            upload.write(decoded)
+        if rest or not size:
+            raise ValidationError(self.INVALID_FILE_MESSAGE)
+        upload.flush()
+        return size
+
+    def check_header(self, upload):
+        upload.seek(0)
+        try:
+            with Image.open(upload, formats=tuple(IMAGE_FORMATS)) as image:
+                image_format, (width, height) = image.format, image.size
+        except (OSError, Image.DecompressionBombError):
+            raise ValidationError(self.INVALID_FILE_MESSAGE)
+        if width * height > settings.IMAGE_UPLOAD_MAX_PIXELS:
+            raise ValidationError(self.TOO_MANY_PIXELS_MESSAGE.format(
+                limit=settings.IMAGE_UPLOAD_MAX_PIXELS))
+        upload.seek(0)
+        return image_format
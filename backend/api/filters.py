@@ -1,40 +1,57 @@
 ﻿import django_filters
+from django.db.models import Exists, OuterRef
 from django_filters import filters
-from recipes.models import Ingredients, Recipe, Tag
+from recipes.models import Recipe
+from recipes.search import search_recipes
 
+from .cache import get_tag_ids
 
-class IngredientsFilter(django_filters.FilterSet):
-    name = django_filters.CharFilter(
-        field_name='name',
-        lookup_expr='icontains',
-    )
 
-    class Meta:
-        model = Ingredients
-        fields = ['name', ]
+def tag_choices():
+    return [(slug, slug) for slug in get_tag_ids()]
 
 
 class RecipeFilter(django_filters.FilterSet):
-    tags = filters.ModelMultipleChoiceFilter(
-        queryset=Tag.objects.all(),
-        field_name='tags__slug',
-        to_field_name='slug'
+    tags = filters.MultipleChoiceFilter(
+        choices=tag_choices,
+        method='get_tags',
     )
+    search = filters.CharFilter(method='get_search')
     is_favorited = filters.NumberFilter(method='get_is_favorited')
     is_in_shopping_cart = filters.NumberFilter(
         method='get_is_in_shopping_cart'
     )
 
+    def get_tags(self, queryset, name, value):
+        tag_ids = get_tag_ids()
+        return queryset.filter(Exists(
+            Recipe.tags.through.objects.filter(
+                recipe=OuterRef('pk'),
+                tag__in=[tag_ids[slug] for slug in value],
+            )
+        ))
+
+    def get_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
+
     def get_is_favorited(self, queryset, name, value):
         if value and self.request.user.is_authenticated:
-            return queryset.filter(fav__user=self.request.user)
+            return queryset.filter(Exists(
+                self.request.user.fav.filter(recipes=OuterRef('pk'))))
         return queryset
 
     def get_is_in_shopping_cart(self, queryset, name, value):
         if value and self.request.user.is_authenticated:
-            return queryset.filter(cart__user=self.request.user)
+            return queryset.filter(Exists(
+                self.request.user.cart.filter(recipes=OuterRef('pk'))))
         return queryset
 
     class Meta:
         model = Recipe
-        fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart',)
+        fields = (
+            'tags',
+            'author',
+            'search',
+            'is_favorited',
+            'is_in_shopping_cart',
+        )
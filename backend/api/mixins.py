@@ -0,0 +1,119 @@
+import gzip
+from hashlib import md5
+
+from django.http import HttpResponse
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                patch_vary_headers, quote_etag)
+from django.utils.http import http_date
+from rest_framework.renderers import JSONRenderer
+
+from .cache import get_stamps, user_stamp
+
+prerendered_lists = {}
+
+
+def accepts_gzip(accept_encoding):
+    """Разрешает ли заголовок Accept-Encoding ответ в gzip.
+
+    Кодировка с q=0 запрещена; `*` относится к gzip, только если gzip
+    не указан явно.
+    """
+    qualities = {}
+    for coding in accept_encoding.split(','):
+        name, *params = coding.split(';')
+        quality = 1.0
+        for param in params:
+            key, _, value = param.strip().partition('=')
+            if key.lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name.strip().lower()] = quality
+    return qualities.get('gzip', qualities.get('*', 0.0)) > 0
+
+
+class ConditionalGetMixin:
+    """Отвечает 304 на list/retrieve, если данные не менялись.
+
+    Валидаторы строятся по отметкам времени из `stamp_names`, а для
+    `user_dependent` вьюсетов ещё и по отметке текущего пользователя,
+    поэтому 304 отдаётся до фильтрации и сериализации.
+    """
+    stamp_names = ()
+    user_dependent = False
+
+    def get_validators(self, request):
+        user = request.user
+        names = list(self.stamp_names)
+        if self.user_dependent and user.is_authenticated:
+            names.append(user_stamp(user.pk))
+        stamps = get_stamps(names)
+        if self.user_dependent:
+            stamps.append(user.pk)
+        etag = quote_etag(md5(repr(stamps).encode()).hexdigest())
+        return etag, int(max(stamps[:len(names)]))
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        etag, last_modified = self.get_validators(request)
+        self.data_version = etag
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified,
+        )
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        # 304 должен нести тот же Vary, что и полный ответ
+        patch_vary_headers(response, getattr(self, 'vary_headers', ()))
+        if self.user_dependent:
+            patch_vary_headers(response, ('Authorization',))
+            if request.user.is_authenticated:
+                patch_cache_control(response, private=True)
+        patch_cache_control(response, no_cache=True)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().retrieve, request, *args, **kwargs)
+
+
+class PrerenderedListMixin:
+    """Отдаёт полный список готовыми байтами JSON и gzip.
+
+    Тело списка рендерится и сжимается один раз на версию данных
+    из `stamp_names` и хранится в памяти воркера.
+    """
+    vary_headers = ('Accept-Encoding',)
+
+    def get_prerendered(self):
+        stamps = get_stamps(self.stamp_names)
+        prerendered = prerendered_lists.get(self.__class__)
+        if prerendered is None or prerendered['stamps'] != stamps:
+            raw = JSONRenderer().render(
+                self.get_serializer(self.get_queryset(), many=True).data)
+            prerendered = {
+                'stamps': stamps,
+                'raw': raw,
+                'gzip': gzip.compress(raw),
+            }
+            prerendered_lists[self.__class__] = prerendered
+        return prerendered
+
+    def list_prerendered(self, request, *args, **kwargs):
+        if request.accepted_renderer.format != 'json':
+            return super().list(request, *args, **kwargs)
+        prerendered = self.get_prerendered()
+        response = HttpResponse(content_type='application/json')
+        if accepts_gzip(request.META.get('HTTP_ACCEPT_ENCODING', '')):
+            response.content = prerendered['gzip']
+            response['Content-Encoding'] = 'gzip'
+        else:
+            response.content = prerendered['raw']
+        response['Content-Length'] = len(response.content)
+        patch_vary_headers(response, self.vary_headers)
+        return response
@@ -0,0 +1,76 @@
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+CURSOR_QUERY_PARAM = 'cursor'
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator, который кэширует COUNT(*) для одинаковых запросов.
+
+    В ключ входит `version` — версия данных вьюсета, поэтому после
+    изменений число объектов пересчитывается сразу. Без версии кэш
+    не используется: устаревшее число обрезало бы страницы.
+    """
+
+    def __init__(self, *args, version='', **kwargs):
+        super().__init__(*args, **kwargs)
+        self.version = version
+
+    @cached_property
+    def count(self):
+        count = Paginator.count.func
+        if not self.version or not hasattr(self.object_list, 'query'):
+            return count(self)
+        sql, params = self.object_list.query.sql_with_params()
+        key = 'page-count:' + md5(
+            f'{self.version}{sql}{params}'.encode()).hexdigest()
+        return cache.get_or_set(
+            key, lambda: count(self), settings.PAGE_COUNT_CACHE_TIMEOUT,
+        )
+
+
+class CachedCountPagination(PageNumberPagination):
+    data_version = ''
+
+    def django_paginator_class(self, object_list, per_page):
+        return CachedCountPaginator(
+            object_list, per_page, version=self.data_version)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.data_version = getattr(view, 'data_version', '')
+        return super().paginate_queryset(queryset, request, view)
+
+
+class RecipeCursorPagination(CursorPagination):
+    cursor_query_param = CURSOR_QUERY_PARAM
+    ordering = ('-publication_date', '-id')
+
+
+class SubscriptionCursorPagination(CursorPagination):
+    cursor_query_param = CURSOR_QUERY_PARAM
+    ordering = ('-date_joined', '-id')
+
+
+class CursorPaginationMixin:
+    """Включает курсорную пагинацию по параметру ?cursor=.
+
+    Без параметра используется постраничная пагинация из настроек.
+    """
+    cursor_pagination_class = None
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            if (
+                self.cursor_pagination_class is not None
+                and CURSOR_QUERY_PARAM in self.request.query_params
+            ):
+                self._paginator = self.cursor_pagination_class()
+            else:
+                return super().paginator
+        return self._paginator
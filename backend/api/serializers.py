@@ -1,11 +1,19 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
 from djoser.serializers import UserCreateSerializer
-from drf_extra_fields.fields import Base64ImageField
+from recipes.bulk import delete_rows, recipe_ingredients_changed
+from recipes.images import current_derivatives, derivative_names
 from recipes.models import (Favorite, Ingredients, IngredientsInRecipe, Recipe,
                             ShoppingCart, Tag)
 from rest_framework import serializers
 from users.models import Subscription
 
+from .cache import get_subscribed_ids
+from .fields import BulkPrimaryKeyRelatedField, StreamingBase64ImageField
+
 User = get_user_model()
 
 
@@ -26,12 +34,7 @@ class UserSerializer(serializers.ModelSerializer):
         )
 
     def get_is_subscribed(self, obj):
-        user = self.context['request'].user
-
-        return (
-            not user.is_anonymous
-            and user.subscriber.filter(author=obj).exists()
-        )
+        return obj.pk in get_subscribed_ids(self.context['request'])
 
 
 class UserCreateSerializer(UserCreateSerializer):
@@ -82,6 +85,60 @@ class ShortRecipeSerializer(serializers.ModelSerializer):
         model = Recipe
 
 
+def get_recipes_limit(request):
+    recipes_limit = request.query_params.get('recipes_limit')
+    if not recipes_limit:
+        return None
+    if not recipes_limit.isdigit():
+        raise serializers.ValidationError(
+            'Укажите числовое значение'
+        )
+    recipes_limit = int(recipes_limit)
+    if recipes_limit < 0:
+        raise serializers.ValidationError(
+            'Значение должно быть положительным'
+        )
+    return recipes_limit
+
+
+def get_latest_recipes(author_ids, recipes_limit):
+    """Возвращает последние рецепты авторов одним запросом.
+
+    Если лимит задан, рецепты нумеруются по автору оконной функцией
+    ROW_NUMBER() и отбираются первые `recipes_limit` для каждого.
+    """
+    recipes = Recipe.objects.filter(author__in=author_ids).only(
+        'id', 'name', 'image', 'cooking_time', 'author',
+    )
+    if recipes_limit is not None:
+        ranked = recipes.annotate(row_number=Window(
+            expression=RowNumber(),
+            partition_by=(F('author'),),
+            order_by=(F('publication_date').desc(), F('id').desc()),
+        )).order_by()
+        sql, params = ranked.query.sql_with_params()
+        recipes = Recipe.objects.raw(
+            f'SELECT * FROM ({sql}) ranked WHERE row_number <= %s '
+            'ORDER BY row_number',
+            (*params, recipes_limit),
+        )
+    latest = {author_id: [] for author_id in author_ids}
+    for recipe in recipes:
+        latest[recipe.author_id].append(recipe)
+    return latest
+
+
+class SubscribeListSerializer(serializers.ListSerializer):
+
+    def to_representation(self, data):
+        authors = list(data)
+        self.child.context['latest_recipes'] = get_latest_recipes(
+            [author.pk for author in authors],
+            get_recipes_limit(self.context['request']),
+        )
+        return super().to_representation(authors)
+
+
 class SubscribeSerializer(UserSerializer):
     recipes_count = serializers.IntegerField()
     recipes = serializers.SerializerMethodField(
@@ -100,23 +157,15 @@ class SubscribeSerializer(UserSerializer):
             'recipes',
             'recipes_count',
         )
+        list_serializer_class = SubscribeListSerializer
 
     def get_recipes(self, obj):
-        recipes_limit = self.context.get(
-            'request').query_params.get('recipes_limit')
-        if recipes_limit:
-            if not recipes_limit.isdigit():
-                raise serializers.ValidationError(
-                    'Укажите числовое значение'
-                )
-            recipes_limit = int(recipes_limit)
-            if recipes_limit < 0:
-                raise serializers.ValidationError(
-                    'Значение должно быть положительным'
-                )
-
+        latest_recipes = self.context.get('latest_recipes')
+        if latest_recipes is None:
+            latest_recipes = get_latest_recipes(
+                [obj.pk], get_recipes_limit(self.context['request']))
         serializer = ShortRecipeSerializer(
-            obj.recipe.all()[:recipes_limit],
+            latest_recipes[obj.pk],
             many=True,
         )
 
@@ -162,37 +211,67 @@ class RecipeSerializer(serializers.ModelSerializer):
     image = serializers.SerializerMethodField(
         method_name='get_image_url',
     )
+    images = serializers.SerializerMethodField()
     is_favorited = serializers.BooleanField(default=False)
     is_in_shopping_cart = serializers.BooleanField(default=False)
 
     class Meta:
         model = Recipe
-        fields = '__all__'
+        exclude = ('search_vector', 'image_derivatives')
 
     def get_image_url(self, obj):
         return obj.image.url
 
+    def get_images(self, obj):
+        """Пока копии не готовы, вместо них отдаётся оригинал."""
+        derivatives = current_derivatives(obj)
+        return {
+            name: default_storage.url(derivatives[name])
+            if name in derivatives else obj.image.url
+            for name in derivative_names()
+        }
+
+
+class IngredientsInRecipeListSerializer(serializers.ListSerializer):
+    """Загружает все ингредиенты рецепта одним запросом IN."""
+
+    def to_internal_value(self, data):
+        items = super().to_internal_value(data)
+        ingredients = Ingredients.objects.in_bulk(
+            {item['id'] for item in items})
+        does_not_exist = serializers.SlugRelatedField.default_error_messages[
+            'does_not_exist']
+        errors = [
+            {} if item['id'] in ingredients else {
+                'id': [does_not_exist.format(slug_name='id', value=item['id'])]
+            }
+            for item in items
+        ]
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        for item in items:
+            item['id'] = ingredients[item['id']]
+        return items
+
 
 class IngredientsInRecipeSerializer(serializers.ModelSerializer):
-    id = serializers.SlugRelatedField(
-        slug_field='id',
-        queryset=Ingredients.objects.all()
-    )
+    id = serializers.IntegerField()
 
     class Meta:
         fields = ('id', 'amount')
         model = IngredientsInRecipe
+        list_serializer_class = IngredientsInRecipeListSerializer
 
 
 class RecipeSerializerPost(serializers.ModelSerializer):
     ingredients = IngredientsInRecipeSerializer(
         many=True,
     )
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = BulkPrimaryKeyRelatedField(
         many=True,
         queryset=Tag.objects.all()
     )
-    image = Base64ImageField()
+    image = StreamingBase64ImageField()
 
     class Meta:
         model = Recipe
@@ -224,18 +303,21 @@ class RecipeSerializerPost(serializers.ModelSerializer):
             set_ingredients.add(ingredient)
         if len(tags) == 0:
             raise serializers.ValidationError('Выберите тэги')
-
-        for tag in tags:
-            if tag not in Tag.objects.all():
-                raise serializers.ValidationError(
-                    'Несуществующий тэг'
-                )
         if cooking_time <= 0:
             raise serializers.ValidationError(
                 'Значение должно быть положительным!'
             )
         return data
 
+    def save(self, **kwargs):
+        try:
+            return super().save(**kwargs)
+        finally:
+            image = self.validated_data.get('image')
+            if image is not None:
+                # временный файл удаляется, если хранилище его не забрало
+                image.close()
+
     def add_ingredients(self, instance, ingredients_data):
         through_instances = []
         for ingredients in ingredients_data:
@@ -247,6 +329,12 @@ class RecipeSerializerPost(serializers.ModelSerializer):
             )
             through_instances.append(through_instance)
         IngredientsInRecipe.objects.bulk_create(through_instances)
+        recipe_ingredients_changed.send(
+            sender=Recipe,
+            recipe_id=instance.pk,
+            ingredient_ids=[
+                through.ingredients_id for through in through_instances],
+        )
         return instance
 
     def create(self, validated_data):
@@ -254,14 +342,54 @@ class RecipeSerializerPost(serializers.ModelSerializer):
         instance = super().create(validated_data)
         return self.add_ingredients(instance, ingredients_data)
 
+    def update_ingredients(self, instance, ingredients_data):
+        """Сравнивает ингредиенты из запроса с сохранёнными и меняет
+        только отличающиеся строки."""
+        incoming = {item['id'].pk: item for item in ingredients_data}
+        stored = {
+            row.ingredients_id: row
+            for row in instance.ingredientsinrecipe_set.all()
+        }
+        created = [
+            IngredientsInRecipe(
+                recipe=instance,
+                ingredients=item['id'],
+                amount=item['amount'],
+            )
+            for pk, item in incoming.items() if pk not in stored
+        ]
+        changed = []
+        for pk, row in stored.items():
+            if pk in incoming and row.amount != incoming[pk]['amount']:
+                row.amount = incoming[pk]['amount']
+                changed.append(row)
+        removed = [row for pk, row in stored.items() if pk not in incoming]
+        IngredientsInRecipe.objects.bulk_create(created)
+        IngredientsInRecipe.objects.bulk_update(changed, ('amount',))
+        if removed:
+            delete_rows(IngredientsInRecipe, [row.pk for row in removed])
+        ingredient_ids = [
+            row.ingredients_id for row in created + changed + removed]
+        if ingredient_ids:
+            recipe_ingredients_changed.send(
+                sender=Recipe,
+                recipe_id=instance.pk,
+                ingredient_ids=ingredient_ids,
+            )
+
     def update(self, instance, validated_data):
         ingredients_data = validated_data.pop('ingredients')
-        super().update(instance, validated_data)
-        instance.ingredients.clear()
-        self.add_ingredients(
-            instance, ingredients_data
-        )
-        instance.save()
+        tags = validated_data.pop('tags')
+        changed_fields = [
+            field for field, value in validated_data.items()
+            if getattr(instance, field) != value
+        ]
+        for field in changed_fields:
+            setattr(instance, field, validated_data[field])
+        if changed_fields:
+            instance.save(update_fields=changed_fields)
+        instance.tags.set(tags)
+        self.update_ingredients(instance, ingredients_data)
         return instance
 
 
@@ -314,6 +442,17 @@ class FavoriteBaseSerializer(serializers.ModelSerializer):
         return serializer.data
 
 
+class BulkRecipesSerializer(serializers.Serializer):
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BULK_RECIPES_LIMIT,
+    )
+
+    def validate_recipes(self, value):
+        return list(dict.fromkeys(value))
+
+
 class FavoriteSerializer(FavoriteBaseSerializer):
 
     class Meta:
@@ -0,0 +1,131 @@
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+from recipes.bulk import collection_changed, recipe_ingredients_changed
+from recipes.catalog import catalog_imported
+from recipes.images import derivatives_ready
+from recipes.models import (Favorite, Ingredients, IngredientsInRecipe, Recipe,
+                            ShoppingCart, Tag)
+from rest_framework.authtoken.models import Token
+from users.models import Subscription, User
+from users.signals import users_updated
+
+from .authentication import token_stamp
+from .cache import invalidate_recipes, touch, user_stamp
+
+AUTHOR_FIELDS = {'email', 'username', 'first_name', 'last_name'}
+
+
+def related_recipe_ids(instance):
+    if isinstance(instance, Tag):
+        recipes = Recipe.objects.filter(tags=instance)
+    else:
+        recipes = Recipe.objects.filter(ingredients=instance)
+    return recipes.values_list('pk', flat=True)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def recipe_changed(sender, instance, **kwargs):
+    invalidate_recipes([instance.pk])
+
+
+@receiver(derivatives_ready, sender=Recipe)
+def recipe_images_ready(sender, recipe_id, **kwargs):
+    invalidate_recipes([recipe_id])
+
+
+@receiver(post_save, sender=IngredientsInRecipe)
+@receiver(post_delete, sender=IngredientsInRecipe)
+def recipe_ingredient_changed(sender, instance, **kwargs):
+    invalidate_recipes([instance.recipe_id])
+
+
+@receiver(recipe_ingredients_changed, sender=Recipe)
+def recipe_ingredients_bulk_changed(sender, recipe_id, **kwargs):
+    invalidate_recipes([recipe_id])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def recipe_relations_changed(sender, instance, action, reverse, pk_set,
+                             **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        invalidate_recipes([instance.pk])
+    elif action == 'pre_clear':
+        invalidate_recipes(related_recipe_ids(instance))
+    else:
+        invalidate_recipes(pk_set)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+@receiver(post_save, sender=Ingredients)
+@receiver(pre_delete, sender=Ingredients)
+def catalog_item_changed(sender, instance, **kwargs):
+    touch(sender._meta.model_name)
+    invalidate_recipes(related_recipe_ids(instance))
+
+
+@receiver(catalog_imported)
+def catalog_imported_changed(sender, changed_ids, **kwargs):
+    touch(sender._meta.model_name)
+    if sender is Tag and changed_ids:
+        invalidate_recipes(Recipe.objects.filter(
+            tags__in=changed_ids).values_list('pk', flat=True).distinct())
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+def user_recipes_changed(sender, instance, **kwargs):
+    touch('recipes', user_stamp(instance.user_id))
+
+
+@receiver(collection_changed)
+def user_recipes_bulk_changed(sender, user_id, **kwargs):
+    touch('recipes', user_stamp(user_id))
+
+
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Subscription)
+def subscription_changed(sender, instance, **kwargs):
+    touch(user_stamp(instance.user_id))
+
+
+@receiver(post_save, sender=User)
+def author_changed(sender, instance, created, update_fields, **kwargs):
+    if created or (update_fields and not AUTHOR_FIELDS & set(update_fields)):
+        return
+    invalidate_recipes(
+        Recipe.objects.filter(author=instance).values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    touch(token_stamp(instance.key))
+
+
+@receiver(post_save, sender=User)
+def user_credentials_changed(sender, instance, created, **kwargs):
+    if created:
+        return
+    touch(*(
+        token_stamp(key)
+        for key in Token.objects.filter(user=instance).values_list(
+            'key', flat=True)
+    ))
+
+
+@receiver(users_updated, sender=User)
+def users_bulk_updated(sender, user_ids, **kwargs):
+    invalidate_recipes(Recipe.objects.filter(
+        author__in=user_ids).values_list('pk', flat=True))
+    touch(*(
+        token_stamp(key)
+        for key in Token.objects.filter(user__in=user_ids).values_list(
+            'key', flat=True)
+    ))
@@ -0,0 +1,117 @@
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from recipes.models import (Favorite, Ingredients, IngredientsInRecipe, Recipe,
+                            ShoppingCart, Tag)
+from rest_framework.test import APIClient
+from users.models import Subscription, User
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+# 1x1 PNG
+PNG = bytes.fromhex(
+    '89504e470d0a1a0a0000000d4948445200000001000000010806000000'
+    '1f15c4890000000d49444154789c6360f80f000001010000185dd3a50000'
+    '000049454e44ae426082'
+)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class RecipeQueryBudgetTest(TestCase):
+    """Число запросов к БД на чтение рецептов не зависит от числа
+    рецептов на странице."""
+    RECIPES = 12
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='reader', email='reader@example.com', password='pass')
+        authors = [
+            User.objects.create_user(
+                username=f'author{i}', email=f'author{i}@example.com',
+                password='pass',
+            )
+            for i in range(3)
+        ]
+        tags = [
+            Tag.objects.create(name=f'tag{i}', color=f'#00000{i}',
+                               slug=f'tag{i}')
+            for i in range(3)
+        ]
+        ingredients = [
+            Ingredients.objects.create(name=f'ingredient{i}',
+                                       measurement_unit='г')
+            for i in range(5)
+        ]
+        for i in range(cls.RECIPES):
+            recipe = Recipe.objects.create(
+                author=authors[i % len(authors)],
+                name=f'recipe{i}',
+                text='text',
+                cooking_time=5,
+                image=SimpleUploadedFile('image.png', PNG, 'image/png'),
+            )
+            recipe.tags.set(tags[:2])
+            for ingredient in ingredients[:3]:
+                IngredientsInRecipe.objects.create(
+                    recipe=recipe, ingredients=ingredient, amount=i + 1)
+            if i % 2:
+                Favorite.objects.create(user=cls.user, recipes=recipe)
+                ShoppingCart.objects.create(user=cls.user, recipes=recipe)
+        Subscription.objects.create(user=cls.user, author=authors[0])
+        cls.recipe = Recipe.objects.first()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.anonymous = APIClient()
+        self.authorized = APIClient()
+        self.authorized.force_authenticate(self.user)
+
+    def assert_query_budget(self, client, url, cold, warm):
+        """Первый запрос собирает кэш, повторный читает из него."""
+        with self.assertNumQueries(cold):
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        with self.assertNumQueries(warm):
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_list_anonymous(self):
+        response = self.assert_query_budget(
+            self.anonymous, '/api/recipes/', cold=6, warm=1)
+        self.assertEqual(len(response.data['results']), 10)
+
+    def test_list_authorized(self):
+        response = self.assert_query_budget(
+            self.authorized, '/api/recipes/', cold=7, warm=1)
+        self.assertEqual(len(response.data['results']), 10)
+
+    def test_list_budget_does_not_depend_on_page_size(self):
+        response = self.assert_query_budget(
+            self.authorized, '/api/recipes/?page=2', cold=7, warm=1)
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_cursor_list_authorized(self):
+        self.assert_query_budget(
+            self.authorized, '/api/recipes/?cursor=', cold=6, warm=1)
+
+    def test_retrieve_anonymous(self):
+        self.assert_query_budget(
+            self.anonymous, f'/api/recipes/{self.recipe.pk}/',
+            cold=5, warm=1,
+        )
+
+    def test_retrieve_authorized(self):
+        self.assert_query_budget(
+            self.authorized, f'/api/recipes/{self.recipe.pk}/',
+            cold=6, warm=1,
+        )
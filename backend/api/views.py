@@ -1,69 +1,77 @@
 from django.contrib.auth import get_user_model
-from django.db.models import Count, Exists, OuterRef, Sum
-from django.http import HttpResponse, HttpResponseNotAllowed
+from django.db import transaction
+from django.db.models import (Exists, F, OuterRef, Prefetch,
+                              prefetch_related_objects)
+from django.http import HttpResponseNotAllowed
 from django.shortcuts import get_object_or_404
 from django_filters import rest_framework as filter
 from djoser.serializers import SetPasswordSerializer
 from djoser.views import UserViewSet as DjoserUserViewSet
+from recipes.bulk import add_recipes, remove_recipes
+from recipes.feed import feed_recipes
 from recipes.models import (Favorite, Ingredients, IngredientsInRecipe, Recipe,
                             ShoppingCart, Tag)
 from rest_framework import permissions, status, viewsets
-from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.decorators import (action, api_view, permission_classes,
+                                       renderer_classes)
 from rest_framework.response import Response
 from users.models import Subscription
 
-from .filters import IngredientsFilter, RecipeFilter
-from .serializers import (FavoriteSerializer, IngredientsSerializer,
-                          RecipeSerializer, RecipeSerializerPost,
-                          ShoppingCartSerializer, SubscribeSerializer,
-                          SubscribeSerializerPost, TagSerializer,
-                          UserCreateSerializer, UserSerializer)
+from .autocomplete import get_ingredient_index
+from .cache import get_recipe_payloads, get_subscribed_ids
+from .exports import EXPORT_RENDERERS, export_response
+from .filters import RecipeFilter
+from .mixins import ConditionalGetMixin, PrerenderedListMixin
+from .pagination import (CursorPaginationMixin, RecipeCursorPagination,
+                         SubscriptionCursorPagination)
+from .serializers import (BulkRecipesSerializer, FavoriteSerializer,
+                          IngredientsSerializer, RecipeSerializer,
+                          RecipeSerializerPost, ShoppingCartSerializer,
+                          SubscribeSerializer, SubscribeSerializerPost,
+                          TagSerializer, UserCreateSerializer, UserSerializer)
 
 User = get_user_model()
 
+RECIPE_ROW_FIELDS = (
+    'is_favorited',
+    'is_in_shopping_cart',
+    'favorites_count',
+    'shopping_cart_count',
+)
+
 
 @api_view(('GET', ))
 @permission_classes((permissions.IsAuthenticated,))
+@renderer_classes(EXPORT_RENDERERS)
 def download_shopping_cart(request):
     if request.method == 'GET':
-        user = request.user
-        favorites = ShoppingCart.objects.filter(
-            user=user).values_list('recipes__id', flat=True)
-        ingredients_list = IngredientsInRecipe.objects.filter(
-            recipe__in=Recipe.objects.filter(id__in=favorites)).values(
-            'ingredients__name',
-            'ingredients__measurement_unit'
-        ).annotate(amount=Sum('amount'))
-        shopping_cart = ''
-        for ingredient in ingredients_list:
-            shopping_cart += (
-                f'{ingredient["ingredients__name"]} - '
-                f'{ingredient["amount"]} '
-                f'{ingredient["ingredients__measurement_unit"]}\r\n'
-            )
-        response = HttpResponse(shopping_cart, content_type='text/plain')
+        export_format = request.query_params.get('format', 'txt')
+        ingredients_list = request.user.shopping_list.values(
+            'amount',
+            name=F('ingredient__name'),
+            measurement_unit=F('ingredient__measurement_unit'),
+        ).order_by('ingredient__name')
+        response = export_response(request, ingredients_list, export_format)
         response['Content-Disposition'] = (
-            'attachment; filename="shopping_cart.txt"'
+            f'attachment; filename="shopping_cart.{export_format}"'
         )
         return response
 
     return HttpResponseNotAllowed(['GET'])
 
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(CursorPaginationMixin, viewsets.ModelViewSet):
     serializer_class = UserSerializer
     queryset = User.objects.all()
     permission_classes = (permissions.IsAuthenticated,)
+    cursor_pagination_class = SubscriptionCursorPagination
 
     def get_user(self):
         return self.request.user
 
     def get_queryset(self):
         if self.action in ('subscriptions', 'subscribe'):
-            return self.queryset.filter(
-                subscribing__user=self.get_user()).annotate(
-                recipes_count=Count('recipe'),
-            )
+            return self.queryset.filter(subscribing__user=self.get_user())
         return self.queryset
 
     def get_permissions(self):
@@ -127,6 +135,7 @@ class UserViewSet(viewsets.ModelViewSet):
         detail=True,
         methods=['post', 'delete', ]
     )
+    @transaction.atomic
     def subscribe(self, request, pk=None):
         get_object_or_404(User, pk=pk)
         context = {'request': request}
@@ -146,29 +155,48 @@ class UserViewSet(viewsets.ModelViewSet):
         return Response(instance_serializer.data, status.HTTP_201_CREATED)
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(ConditionalGetMixin, PrerenderedListMixin,
+                 viewsets.ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
     pagination_class = None
+    stamp_names = ('tag',)
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            self.list_prerendered, request, *args, **kwargs)
 
 
-class IngredientsViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientsViewSet(ConditionalGetMixin, PrerenderedListMixin,
+                         viewsets.ReadOnlyModelViewSet):
     queryset = Ingredients.objects.all()
     serializer_class = IngredientsSerializer
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
     pagination_class = None
-    search_fields = ('^name',)
-    filter_backends = (filter.DjangoFilterBackend,)
-    filterset_class = IngredientsFilter
+    stamp_names = ('ingredients',)
+
+    def list_autocomplete(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if not name:
+            return self.list_prerendered(request, *args, **kwargs)
+        return Response(get_ingredient_index().search(name))
 
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            self.list_autocomplete, request, *args, **kwargs)
 
-class RecipeViewSet(viewsets.ModelViewSet):
+
+class RecipeViewSet(ConditionalGetMixin, CursorPaginationMixin,
+                    viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     serializer_class = RecipeSerializer
     permission_classes = (
         permissions.IsAuthenticatedOrReadOnly,
     )
+    cursor_pagination_class = RecipeCursorPagination
+    stamp_names = ('recipes',)
+    user_dependent = True
     filter_backends = (filter.DjangoFilterBackend,)
     filterset_class = RecipeFilter
 
@@ -176,12 +204,76 @@ class RecipeViewSet(viewsets.ModelViewSet):
         user = self.request.user
         if user.is_anonymous:
             return self.queryset
-        return self.queryset.annotate(
+        queryset = self.queryset.annotate(
             is_favorited=Exists(
                 user.fav.filter(recipes=OuterRef('pk'))),
             is_in_shopping_cart=Exists(
                 user.cart.filter(recipes=OuterRef('pk'))),
         )
+        if self.action == 'feed':
+            return feed_recipes(queryset, user)
+        return queryset
+
+    related_lookups = (
+        'author',
+        'tags',
+        Prefetch(
+            'ingredientsinrecipe_set',
+            queryset=IngredientsInRecipe.objects.select_related(
+                'ingredients'),
+        ),
+    )
+
+    def get_cached_data(self, recipes):
+        """Берёт общие части рецептов из кэша и дополняет их данными
+        текущего пользователя."""
+        def build(missing):
+            # Строки страницы прочитаны до версий: перечитываем их, чтобы
+            # изменение между этими чтениями не попало в кэш под новой
+            # версией со старыми данными.
+            fresh = Recipe.objects.prefetch_related(
+                *self.related_lookups).in_bulk(
+                    [recipe.pk for recipe in missing])
+            missing = [fresh.get(recipe.pk, recipe) for recipe in missing]
+            return RecipeSerializer(
+                missing, many=True, context=self.get_serializer_context(),
+            ).data
+
+        recipes = list(recipes)
+        payloads = get_recipe_payloads(recipes, build)
+        subscribed_ids = get_subscribed_ids(self.request)
+        for recipe, data in zip(recipes, payloads):
+            for field in RECIPE_ROW_FIELDS:
+                data[field] = getattr(recipe, field, False)
+            data['author']['is_subscribed'] = (
+                recipe.author_id in subscribed_ids)
+        return payloads
+
+    def list_cached(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.get_cached_data(page))
+        return Response(self.get_cached_data(queryset))
+
+    def retrieve_cached(self, request, *args, **kwargs):
+        return Response(self.get_cached_data([self.get_object()])[0])
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            self.list_cached, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            self.retrieve_cached, request, *args, **kwargs)
+
+    @action(
+        detail=False,
+        permission_classes=(permissions.IsAuthenticated,),
+    )
+    def feed(self, request, *args, **kwargs):
+        return self.conditional_response(
+            self.list_cached, request, *args, **kwargs)
 
     serializer_class_by_action = {
         'create': RecipeSerializerPost,
@@ -189,6 +281,8 @@ class RecipeViewSet(viewsets.ModelViewSet):
         'partial_update': RecipeSerializerPost,
         'favorite': FavoriteSerializer,
         'shopping_cart': ShoppingCartSerializer,
+        'favorite_bulk': BulkRecipesSerializer,
+        'shopping_cart_bulk': BulkRecipesSerializer,
     }
 
     def get_serializer_class(self):
@@ -200,10 +294,12 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return super(RecipeViewSet, self).get_serializer_class()
 
     def return_status(self, instanse, status):
+        prefetch_related_objects([instanse], *self.related_lookups)
         instance_serializer = RecipeSerializer(
             instanse, context={'request': self.request})
         return Response(instance_serializer.data, status)
 
+    @transaction.atomic
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -211,6 +307,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
         return self.return_status(new_recipe, status.HTTP_201_CREATED)
 
+    @transaction.atomic
     def update(self, request, *args, **kwargs):
         partial = kwargs.pop('partial', False)
         instance = self.get_object()
@@ -222,6 +319,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
         return self.return_status(instance, status.HTTP_200_OK)
 
+    @transaction.atomic
     def favorite_shopping_cart(self, request, model, pk):
         serializer = self.get_serializer(
             data={'recipes': pk},
@@ -249,3 +347,33 @@ class RecipeViewSet(viewsets.ModelViewSet):
     )
     def shopping_cart(self, request, pk=None):
         return self.favorite_shopping_cart(request, ShoppingCart, pk)
+
+    @transaction.atomic
+    def bulk_favorite_shopping_cart(self, request, model):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user = request.user
+        change = add_recipes if request.method == 'POST' else remove_recipes
+        report = change(model, user, serializer.validated_data['recipes'])
+        return Response(
+            [{'id': pk, 'result': result} for pk, result in report.items()],
+            status=status.HTTP_200_OK,
+        )
+
+    @action(
+        detail=False,
+        methods=['post', 'delete', ],
+        url_path='favorite',
+        url_name='favorite-bulk',
+    )
+    def favorite_bulk(self, request):
+        return self.bulk_favorite_shopping_cart(request, Favorite)
+
+    @action(
+        detail=False,
+        methods=['post', 'delete', ],
+        url_path='shopping_cart',
+        url_name='shopping-cart-bulk',
+    )
+    def shopping_cart_bulk(self, request):
+        return self.bulk_favorite_shopping_cart(request, ShoppingCart)
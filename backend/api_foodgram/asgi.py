@@ -9,8 +9,19 @@ https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 
 import os
 
+from asgiref.sync import ThreadSensitiveContext
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'api_foodgram.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+
+async def application(scope, receive, send):
+    """Выполняет синхронный код каждого запроса в собственном потоке.
+
+    Без контекста Django 3.2 запускает все синхронные вьюхи в одном
+    общем потоке, и запросы к API обрабатываются строго по очереди.
+    """
+    async with ThreadSensitiveContext():
+        await django_application(scope, receive, send)
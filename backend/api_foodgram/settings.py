@@ -68,14 +68,31 @@ REST_FRAMEWORK = {
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
 
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.LimitedJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.CachedCountPagination',
     'PAGE_SIZE': 10,
 
 }
 
+PAGE_COUNT_CACHE_TIMEOUT = 60
+
+ADMIN_ESTIMATED_COUNT_THRESHOLD = 10000
+
+AUTH_TOKEN_CACHE_SIZE = 10000
+
+AUTH_TOKEN_CACHE_TTL = 5 * 60
+
+AUTH_TOKEN_SHARED_CACHE = os.getenv(
+    'AUTH_TOKEN_SHARED_CACHE', default='False') == 'True'
+
 
 TEMPLATES = [
     {
@@ -106,6 +123,48 @@ DATABASES = {
     }
 }
 
+# Кэш хранит версии и отметки изменений, по которым сбрасываются
+# кэшированные рецепты, ETag и токены. При нескольких воркерах он должен
+# быть общим (memcached, см. infra/docker-compose.yml): LocMemCache у
+# каждого процесса свой, и изменения не дойдут до остальных воркеров.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache',
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', default=''),
+    }
+}
+
+RECIPE_CACHE_TIMEOUT = 60 * 60
+
+RECIPE_CACHE_LOCK_TIMEOUT = 5
+
+SUBSCRIPTIONS_CACHE_TIMEOUT = 60 * 60
+
+FEED_FANOUT_LIMIT = 10000
+
+BULK_RECIPES_LIMIT = 100
+
+RECIPE_IMAGE_SIZES = {
+    'small': 320,
+    'medium': 800,
+}
+
+RECIPE_IMAGE_QUALITY = 80
+
+RECIPE_IMAGE_WORKERS = 2
+
+IMAGE_UPLOAD_MAX_BYTES = 10 * 1024 * 1024
+
+IMAGE_UPLOAD_MAX_PIXELS = 40 * 1000 * 1000
+
+# base64 раздувает изображение на треть, остальное — поля рецепта
+JSON_BODY_MAX_BYTES = IMAGE_UPLOAD_MAX_BYTES * 4 // 3 + 1024 * 1024
+
+INGREDIENT_AUTOCOMPLETE_LIMIT = 20
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
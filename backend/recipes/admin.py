@@ -1,21 +1,84 @@
+from django.conf import settings
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
 
 from .models import (Favorite, Ingredients, IngredientsInRecipe, Recipe,
                      ShoppingCart, Tag)
+from .search import search_recipes
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator, который для больших таблиц без фильтров берёт число
+    строк из статистики PostgreSQL вместо COUNT(*)."""
+
+    @cached_property
+    def count(self):
+        count = Paginator.count.func
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql' or queryset.query.where:
+            return count(self)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE relname = %s',
+                (queryset.model._meta.db_table,),
+            )
+            row = cursor.fetchone()
+        if row is None or row[0] < settings.ADMIN_ESTIMATED_COUNT_THRESHOLD:
+            return count(self)
+        return int(row[0])
+
+
+class InputFilter(admin.SimpleListFilter):
+    """Фильтр с полем ввода вместо списка всех возможных значений."""
+    template = 'admin/input_filter.html'
+
+    def lookups(self, request, model_admin):
+        return ((None, None),)
+
+    def choices(self, changelist):
+        all_choice = next(super().choices(changelist))
+        all_choice['query_parts'] = (
+            (name, value)
+            for name, value in changelist.get_filters_params().items()
+            if name != self.parameter_name
+        )
+        yield all_choice
+
+
+class AuthorFilter(InputFilter):
+    title = 'автору (username)'
+    parameter_name = 'author'
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(author__username=self.value())
+        return queryset
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(IngredientsInRecipe)
-class IngredientsInRecipeAdmin(admin.ModelAdmin):
+class IngredientsInRecipeAdmin(LargeTableAdmin):
+    list_display = ('recipe', 'ingredients', 'amount')
+    list_select_related = ('recipe', 'ingredients')
     fields = ('recipe', 'ingredients', 'amount', )
-    search_fields = ('name', )
+    search_fields = ('recipe__name', 'ingredients__name')
+    autocomplete_fields = ('recipe', 'ingredients')
 
 
 class IngredientsInRecipeInline(admin.TabularInline):
     model = IngredientsInRecipe
+    autocomplete_fields = ('ingredients',)
 
 
 @admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(LargeTableAdmin):
     list_display = (
         'author',
         'name',
@@ -24,17 +87,18 @@ class RecipeAdmin(admin.ModelAdmin):
         'cooking_time',
         'favorites_count',
     )
+    list_select_related = ('author',)
     search_fields = ('name',)
-    list_filter = ('author', )
+    list_filter = (AuthorFilter, )
     filter_horizontal = ('tags',)
-    autocomplete_fields = ('ingredients',)
+    autocomplete_fields = ('author',)
     inlines = (IngredientsInRecipeInline, )
     empty_value_display = '-пусто-'
 
-    def favorites_count(self, obj):
-        return obj.fav.count()
-
-    favorites_count.short_description = 'Количество добавлений в избранное'
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return search_recipes(queryset, search_term), False
 
 
 @admin.register(Ingredients)
@@ -49,13 +113,18 @@ class TagAdmin(admin.ModelAdmin):
     search_fields = ('name',)
 
 
-@admin.register(Favorite)
-class FavoriteAdmin(admin.ModelAdmin):
+class FavoriteBaseAdmin(LargeTableAdmin):
     list_display = ('user', 'recipes')
-    search_fields = ('recipes',)
+    list_select_related = ('user', 'recipes')
+    search_fields = ('user__username', 'recipes__name')
+    autocomplete_fields = ('user', 'recipes')
+
+
+@admin.register(Favorite)
+class FavoriteAdmin(FavoriteBaseAdmin):
+    pass
 
 
 @admin.register(ShoppingCart)
-class ShoppingCartAdmin(admin.ModelAdmin):
-    list_display = ('user', 'recipes')
-    search_fields = ('user', 'recipes',)
+class ShoppingCartAdmin(FavoriteBaseAdmin):
+    pass
@@ -0,0 +1,93 @@
+from django.db import connections
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.dispatch import Signal
+
+from .models import Favorite, Recipe, ShoppingCart
+
+ADDED = 'added'
+EXISTS = 'exists'
+REMOVED = 'removed'
+MISSING = 'missing'
+NOT_FOUND = 'not_found'
+
+# Массовые операции не вызывают post_save и post_delete, поэтому об
+# изменениях сообщают эти сигналы. Отправитель — модель коллекции.
+collection_changed = Signal()
+# Отправитель — Recipe.
+recipe_ingredients_changed = Signal()
+
+COLLECTION_COUNTERS = {
+    Favorite: 'favorites_count',
+    ShoppingCart: 'shopping_cart_count',
+}
+
+
+def recount(model, recipe_ids):
+    """Пересчитывает счётчик коллекции одним UPDATE по списку рецептов."""
+    field = COLLECTION_COUNTERS[model]
+    totals = model.objects.filter(recipes=OuterRef('pk')).order_by().values(
+        'recipes').annotate(total=Count('pk')).values('total')
+    Recipe.objects.filter(pk__in=recipe_ids).update(
+        **{field: Coalesce(Subquery(totals), Value(0))})
+
+
+def delete_rows(model, pks, using='default'):
+    """Удаляет строки по первичному ключу одним DELETE, не загружая
+    объекты и не вызывая post_delete."""
+    connection = connections[using]
+    table = connection.ops.quote_name(model._meta.db_table)
+    column = connection.ops.quote_name(model._meta.pk.column)
+    placeholders = ', '.join(['%s'] * len(pks))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE {column} IN ({placeholders})', pks)
+
+
+def split_recipe_ids(model, user, recipe_ids):
+    """Делит id на несуществующие и уже лежащие в коллекции
+    пользователя двумя запросами на весь список. Для лежащих в коллекции
+    возвращает словарь id рецепта -> id строки коллекции."""
+    found = set(Recipe.objects.filter(
+        pk__in=recipe_ids).values_list('pk', flat=True))
+    linked = dict(model.objects.filter(
+        user=user, recipes__in=recipe_ids).values_list('recipes', 'pk'))
+    return found, linked
+
+
+def add_recipes(model, user, recipe_ids):
+    """Добавляет рецепты в избранное или корзину одним INSERT.
+
+    Возвращает словарь id -> результат.
+    """
+    found, linked = split_recipe_ids(model, user, recipe_ids)
+    report = {
+        pk: NOT_FOUND if pk not in found else EXISTS if pk in linked
+        else ADDED
+        for pk in recipe_ids
+    }
+    added = [pk for pk, result in report.items() if result == ADDED]
+    if added:
+        model.objects.bulk_create(
+            [model(user=user, recipes_id=pk) for pk in added],
+            ignore_conflicts=True,
+        )
+        collection_changed.send(
+            sender=model, user_id=user.pk, recipe_ids=added)
+    return report
+
+
+def remove_recipes(model, user, recipe_ids):
+    """Убирает рецепты из избранного или корзины одним DELETE."""
+    found, linked = split_recipe_ids(model, user, recipe_ids)
+    report = {
+        pk: NOT_FOUND if pk not in found else REMOVED if pk in linked
+        else MISSING
+        for pk in recipe_ids
+    }
+    removed = [pk for pk, result in report.items() if result == REMOVED]
+    if removed:
+        delete_rows(model, [linked[pk] for pk in removed])
+        collection_changed.send(
+            sender=model, user_id=user.pk, recipe_ids=removed)
+    return report
@@ -0,0 +1,122 @@
+import csv
+import json
+import re
+from itertools import islice
+
+from django.db import transaction
+from django.dispatch import Signal
+
+from .models import Ingredients, Tag
+
+JSON_READ_SIZE = 64 * 1024
+
+JSON_SEPARATORS = re.compile(r'[\s,]*')
+
+# отправляется после каждой партии, так как bulk-операции
+# не вызывают сигналы моделей
+catalog_imported = Signal()
+
+
+def read_csv(file):
+    yield from csv.DictReader(file)
+
+
+def read_json(file):
+    """Читает JSON-массив объектов по частям, не загружая файл целиком."""
+    decoder = json.JSONDecoder()
+    buffer = file.read(JSON_READ_SIZE)
+    position = JSON_SEPARATORS.match(buffer).end()
+    if not buffer.startswith('[', position):
+        raise ValueError('ожидается JSON-массив объектов')
+    position, eof = position + 1, False
+    while True:
+        position = JSON_SEPARATORS.match(buffer, position).end()
+        if buffer.startswith(']', position):
+            return
+        try:
+            row, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            chunk = file.read(JSON_READ_SIZE)
+            eof = not chunk
+            buffer, position = buffer[position:] + chunk, 0
+            continue
+        yield row
+
+
+def batches(rows, size):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def import_ingredients(rows):
+    """Добавляет ингредиенты, которых ещё нет; возвращает число новых."""
+    ingredients = {
+        (row['name'].strip(), row['measurement_unit'].strip()): None
+        for row in rows
+    }
+    existing = set(Ingredients.objects.filter(
+        name__in={name for name, _ in ingredients},
+    ).values_list('name', 'measurement_unit'))
+    new = [key for key in ingredients if key not in existing]
+    Ingredients.objects.bulk_create(
+        [Ingredients(name=name, measurement_unit=unit) for name, unit in new],
+        ignore_conflicts=True,
+    )
+    created = len(new)
+    if created:
+        catalog_imported.send(sender=Ingredients, changed_ids=())
+    return created, 0
+
+
+def import_tags(rows):
+    """Добавляет тэги по slug и обновляет название и цвет существующих.
+
+    Возвращает число добавленных и изменённых тэгов.
+    """
+    tags = {
+        row['slug'].strip(): (row['name'].strip(), row['color'].strip())
+        for row in rows
+    }
+    existing = Tag.objects.in_bulk(tags, field_name='slug')
+    changed = []
+    for slug, tag in existing.items():
+        if (tag.name, tag.color) != tags[slug]:
+            tag.name, tag.color = tags[slug]
+            changed.append(tag)
+    Tag.objects.bulk_update(changed, ('name', 'color'))
+    new = [
+        Tag(slug=slug, name=name, color=color)
+        for slug, (name, color) in tags.items() if slug not in existing
+    ]
+    Tag.objects.bulk_create(new, ignore_conflicts=True)
+    created = len(new)
+    if created or changed:
+        catalog_imported.send(
+            sender=Tag, changed_ids=[tag.pk for tag in changed])
+    return created, len(changed)
+
+
+IMPORTERS = {
+    'ingredients': import_ingredients,
+    'tags': import_tags,
+}
+
+
+def import_catalog(rows, kind, batch_size, progress=None):
+    """Загружает справочник партиями, каждая в своей транзакции."""
+    total = created = updated = 0
+    for batch in batches(rows, batch_size):
+        with transaction.atomic():
+            batch_created, batch_updated = IMPORTERS[kind](batch)
+        total += len(batch)
+        created += batch_created
+        updated += batch_updated
+        if progress is not None:
+            progress(total, created, updated)
+    return total, created, updated
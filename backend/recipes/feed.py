@@ -0,0 +1,123 @@
+from django.conf import settings
+from django.db.models import Exists, OuterRef, Q
+from users.models import Subscription, User
+
+from .models import Recipe, TimelineEntry
+
+FEED_BATCH_SIZE = 1000
+
+
+def fans_out(author_id):
+    """Рецепты авторов с числом подписчиков от FEED_FANOUT_LIMIT
+    не раскладываются по лентам, а подмешиваются при чтении."""
+    return User.objects.filter(
+        pk=author_id, followers_count__lt=settings.FEED_FANOUT_LIMIT,
+    ).exists()
+
+
+def push_recipe(recipe):
+    """Добавляет новый рецепт в ленты всех подписчиков автора."""
+    if not fans_out(recipe.author_id):
+        return
+    followers = Subscription.objects.filter(
+        author=recipe.author_id, user__isnull=False,
+    ).order_by().values_list('user', flat=True)
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(
+                user_id=user_id,
+                recipe_id=recipe.pk,
+                author_id=recipe.author_id,
+                publication_date=recipe.publication_date,
+            )
+            for user_id in followers.iterator()
+        ),
+        batch_size=FEED_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill_timeline(user_id, author_id):
+    """Дописывает в ленту подписчика рецепты нового автора."""
+    if user_id is None or not fans_out(author_id):
+        return
+    recipes = Recipe.objects.filter(author=author_id).order_by().values_list(
+        'pk', 'publication_date')
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(
+                user_id=user_id,
+                recipe_id=pk,
+                author_id=author_id,
+                publication_date=publication_date,
+            )
+            for pk, publication_date in recipes.iterator()
+        ),
+        batch_size=FEED_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def dropped_below_fanout_limit(author_id):
+    """Число подписчиков автора только что стало меньше FEED_FANOUT_LIMIT."""
+    return User.objects.filter(
+        pk=author_id, followers_count=settings.FEED_FANOUT_LIMIT - 1,
+    ).exists()
+
+
+def backfill_followers(author_id):
+    """Раскладывает рецепты автора по лентам всех его подписчиков.
+
+    Пока рецепты автора не раскладывались по лентам, новые подписчики
+    тоже не получали его старых рецептов, поэтому дописываются все;
+    уже существующие записи пропускаются.
+    """
+    recipes = list(Recipe.objects.filter(
+        author=author_id,
+    ).order_by().values_list('pk', 'publication_date'))
+    if not recipes:
+        return
+    followers = Subscription.objects.filter(
+        author=author_id, user__isnull=False,
+    ).order_by().values_list('user', flat=True)
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(
+                user_id=user_id,
+                recipe_id=pk,
+                author_id=author_id,
+                publication_date=publication_date,
+            )
+            for user_id in followers.iterator()
+            for pk, publication_date in recipes
+        ),
+        batch_size=FEED_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def trim_timeline(user_id, author_id):
+    TimelineEntry.objects.filter(user=user_id, author=author_id).delete()
+
+
+def feed_recipes(queryset, user):
+    """Отбирает из queryset ленту рецептов авторов, на которых подписан
+    пользователь.
+
+    Лента читается диапазоном по индексу таблицы TimelineEntry; рецепты
+    авторов без раскладки по лентам добавляются отдельным условием.
+    """
+    celebrity_ids = list(Subscription.objects.filter(
+        user=user,
+        author__followers_count__gte=settings.FEED_FANOUT_LIMIT,
+    ).values_list('author', flat=True))
+    if not celebrity_ids:
+        return queryset.filter(timeline_entries__user=user).order_by(
+            '-timeline_entries__publication_date',
+            '-timeline_entries__recipe',
+        )
+    return queryset.filter(
+        Q(Exists(TimelineEntry.objects.filter(
+            user=user, recipe=OuterRef('pk'))))
+        | Q(author__in=celebrity_ids)
+    )
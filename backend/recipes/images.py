@@ -0,0 +1,171 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import F
+from django.dispatch import Signal
+from PIL import Image, ImageOps
+
+from .models import Recipe, StoredImage
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVES_DIR = 'recipes/derivatives'
+
+# (формат Pillow, расширение файла, суффикс имени производного)
+DERIVATIVE_FORMATS = (
+    ('JPEG', 'jpg', ''),
+    ('WEBP', 'webp', '_webp'),
+)
+
+derivatives_ready = Signal()
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.RECIPE_IMAGE_WORKERS,
+    thread_name_prefix='recipe-images',
+)
+
+
+def derivative_names():
+    return [
+        f'{size}{suffix}'
+        for size in settings.RECIPE_IMAGE_SIZES
+        for _, _, suffix in DERIVATIVE_FORMATS
+    ]
+
+
+def derivatives_dir(name):
+    stem = os.path.splitext(os.path.basename(name))[0]
+    return f'{DERIVATIVES_DIR}/{stem}/'
+
+
+def current_derivatives(recipe):
+    """Производные, построенные для текущего изображения рецепта."""
+    prefix = derivatives_dir(recipe.image.name)
+    return {
+        name: path
+        for name, path in (recipe.image_derivatives or {}).items()
+        if path.startswith(prefix)
+    }
+
+
+def derivatives_built(recipe):
+    return set(current_derivatives(recipe)) == set(derivative_names())
+
+
+def render(image, image_format):
+    if image_format == 'JPEG' and image.mode != 'RGB':
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A')
+                         if 'A' in image.getbands() else None)
+        image = background
+    buffer = BytesIO()
+    image.save(buffer, image_format, quality=settings.RECIPE_IMAGE_QUALITY)
+    return ContentFile(buffer.getvalue())
+
+
+def render_derivatives(image_file):
+    """Строит копии файла изображения и возвращает их пути и размеры
+    оригинала."""
+    with image_file.storage.open(image_file.name, 'rb') as source:
+        image = ImageOps.exif_transpose(Image.open(source))
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+    derivatives = {}
+    for size, max_side in settings.RECIPE_IMAGE_SIZES.items():
+        resized = image.copy()
+        resized.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+        for image_format, extension, suffix in DERIVATIVE_FORMATS:
+            path = f'{derivatives_dir(image_file.name)}{size}.{extension}'
+            default_storage.delete(path)
+            derivatives[f'{size}{suffix}'] = default_storage.save(
+                path, render(resized, image_format))
+    return derivatives, image.size
+
+
+def build_derivatives(recipe, force=False):
+    """Сохраняет уменьшенные копии изображения рецепта в JPEG и WebP
+    и записывает его размеры.
+
+    Копии общего с другим рецептом файла не перестраиваются, а берутся
+    у этого рецепта. Возвращает False, если производные для текущего
+    изображения уже построены.
+    """
+    name = recipe.image.name
+    if not name or (not force and derivatives_built(recipe)):
+        return False
+    siblings = [] if force else Recipe.objects.filter(
+        image=name, image_width__isnull=False,
+    ).exclude(pk=recipe.pk).only(
+        'image', 'image_width', 'image_height', 'image_derivatives')
+    sibling = next(
+        (other for other in siblings if derivatives_built(other)), None)
+    if sibling is None:
+        derivatives, (width, height) = render_derivatives(recipe.image)
+    else:
+        derivatives = sibling.image_derivatives
+        width, height = sibling.image_width, sibling.image_height
+    updated = Recipe.objects.filter(pk=recipe.pk, image=name).update(
+        image_width=width,
+        image_height=height,
+        image_derivatives=derivatives,
+    )
+    if updated:
+        derivatives_ready.send(sender=Recipe, recipe_id=recipe.pk)
+    return bool(updated)
+
+
+def build_derivatives_task(recipe_id):
+    try:
+        recipe = Recipe.objects.filter(pk=recipe_id).first()
+        if recipe is not None:
+            build_derivatives(recipe)
+    except Exception:
+        logger.exception(
+            'Не удалось построить изображения рецепта %s', recipe_id)
+    finally:
+        connection.close()
+
+
+def delete_image_files(name):
+    """Удаляет файл изображения и все его копии."""
+    Recipe._meta.get_field('image').storage.delete(name)
+    directory = derivatives_dir(name)
+    if default_storage.exists(directory):
+        for file_name in default_storage.listdir(directory)[1]:
+            default_storage.delete(directory + file_name)
+
+
+def delete_unreferenced(name):
+    with transaction.atomic():
+        stored = StoredImage.objects.select_for_update().filter(
+            name=name, references=0).first()
+        if stored is None:
+            return
+        delete_image_files(name)
+        stored.delete()
+
+
+def release_image(name):
+    """Снимает одну ссылку на файл изображения.
+
+    Файл и его копии удаляются после фиксации транзакции, если к этому
+    времени на файл не сослалось новое сохранение.
+    """
+    updated = StoredImage.objects.filter(
+        name=name, references__gt=0,
+    ).update(references=F('references') - 1)
+    if updated:
+        transaction.on_commit(lambda: delete_unreferenced(name))
+
+
+def schedule_derivatives(recipe_id):
+    """Ставит построение производных в пул после фиксации транзакции."""
+    transaction.on_commit(
+        lambda: executor.submit(build_derivatives_task, recipe_id))
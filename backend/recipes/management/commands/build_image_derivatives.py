@@ -0,0 +1,50 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management import BaseCommand
+from django.db import connection
+from recipes.images import build_derivatives
+from recipes.models import Recipe
+
+
+def build(recipe_id, force):
+    try:
+        recipe = Recipe.objects.filter(pk=recipe_id).first()
+        return recipe is not None and build_derivatives(recipe, force=force)
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = "Builds resized and WebP copies of existing recipe images"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Rebuild copies that already exist',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=settings.RECIPE_IMAGE_WORKERS,
+            help='Number of images processed in parallel',
+        )
+
+    def handle(self, *args, **options):
+        recipe_ids = Recipe.objects.exclude(image='').order_by(
+            'pk').values_list('pk', flat=True)
+        built = failed = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            futures = {
+                pool.submit(build, recipe_id, options['force']): recipe_id
+                for recipe_id in recipe_ids.iterator()
+            }
+            for future in as_completed(futures):
+                try:
+                    built += future.result()
+                except Exception as error:
+                    failed += 1
+                    self.stderr.write(f'Recipe {futures[future]}: {error}')
+        self.stdout.write(f'{built} recipes processed, {failed} failed')
+        self.stdout.write(self.style.SUCCESS('Done'))
@@ -0,0 +1,73 @@
+import os
+from datetime import timedelta
+
+from django.core.management import BaseCommand
+from django.utils import timezone
+from recipes.images import delete_unreferenced
+from recipes.models import Recipe, StoredImage
+
+BATCH_SIZE = 500
+
+
+def walk(storage, directory):
+    directories, files = storage.listdir(directory)
+    for file_name in files:
+        yield os.path.join(directory, file_name)
+    for subdirectory in directories:
+        yield from walk(storage, os.path.join(directory, subdirectory))
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes recipe image files that no StoredImage row refers to, "
+        "e.g. files saved by a transaction that was rolled back"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-age',
+            type=int,
+            default=60,
+            help='Skip files modified less than this many minutes ago, '
+                 'their uploads may still be in progress',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only list the files that would be deleted',
+        )
+
+    def handle(self, *args, **options):
+        field = Recipe._meta.get_field('image')
+        storage = field.storage
+        directory = field.upload_to.rstrip('/')
+        if not storage.exists(directory):
+            self.stdout.write('Nothing to delete')
+            return
+        cutoff = timezone.now() - timedelta(minutes=options['min_age'])
+        names = [
+            name for name in walk(storage, directory)
+            if storage.get_modified_time(name) < cutoff
+        ]
+        orphans = []
+        for start in range(0, len(names), BATCH_SIZE):
+            batch = names[start:start + BATCH_SIZE]
+            known = set(StoredImage.objects.filter(
+                name__in=batch).values_list('name', flat=True))
+            orphans.extend(name for name in batch if name not in known)
+        released = list(StoredImage.objects.filter(
+            references=0).values_list('name', flat=True))
+        for name in orphans + released:
+            if options['dry_run']:
+                self.stdout.write(name)
+                continue
+            # Строка без ссылок блокирует имя: параллельное сохранение
+            # того же файла либо дождётся удаления и запишет файл заново,
+            # либо успеет добавить ссылку, и тогда файл останется.
+            StoredImage.objects.get_or_create(name=name)
+            delete_unreferenced(name)
+        self.stdout.write(
+            f'{len(orphans)} orphaned files, '
+            f'{len(released)} released files'
+        )
+        self.stdout.write(self.style.SUCCESS('Done'))
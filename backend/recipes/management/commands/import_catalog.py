@@ -0,0 +1,60 @@
+import os
+import time
+
+from django.core.management import BaseCommand, CommandError
+from recipes.catalog import IMPORTERS, import_catalog, read_csv, read_json
+
+READERS = {
+    '.csv': read_csv,
+    '.json': read_json,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Loads ingredients or tags from CSV or JSON in batches; "
+        "safe to run again on a filled database"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Path to a .csv or .json file')
+        parser.add_argument(
+            '--kind',
+            choices=sorted(IMPORTERS),
+            help='Catalog to load; guessed from the file name by default',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows written per transaction',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        reader = READERS.get(os.path.splitext(path)[1].lower())
+        if reader is None:
+            raise CommandError('Only .csv and .json files are supported')
+        kind = options['kind'] or next(
+            (kind for kind in IMPORTERS if kind in os.path.basename(path)),
+            None,
+        )
+        if kind is None:
+            raise CommandError('Pass --kind, it cannot be guessed from path')
+        started = time.monotonic()
+
+        def progress(total, created, updated):
+            self.stdout.write(
+                f'{total} rows read, {created} created, {updated} updated')
+
+        with open(path, encoding='utf-8-sig', newline='') as file:
+            try:
+                total, created, updated = import_catalog(
+                    reader(file), kind, options['batch_size'], progress)
+            except (KeyError, ValueError) as error:
+                raise CommandError(f'Malformed {kind} file: {error}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Done in {time.monotonic() - started:.1f}s: {total} rows, '
+            f'{created} created, {updated} updated, '
+            f'{total - created - updated} unchanged'
+        ))
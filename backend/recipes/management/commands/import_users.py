@@ -1,29 +1,137 @@
-﻿from csv import DictReader
+﻿import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 
+import django
+from django.contrib.auth.hashers import make_password
 from django.core.management import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from recipes.catalog import batches, read_csv
 from users.models import User
+from users.signals import users_updated
 
-ALREDY_LOADED_ERROR_MESSAGE = """
-If you need to reload the data from the CSV file,
-first delete the db.sqlite3 file to destroy the database.
-Then, run `python manage.py migrate` for a new empty
-database with tables"""
+PROFILE_FIELDS = ('username', 'email', 'first_name', 'last_name')
+
+
+def hash_password(password):
+    return make_password(password or None)
+
+
+def available_cpus():
+    """Число процессоров, на которых разрешено работать процессу."""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
 
 
 class Command(BaseCommand):
-    # Show this when the user types help
-    help = "Loads data from csv"
+    help = (
+        "Loads users from csv in batches, hashing passwords "
+        "in a process pool"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='./users.csv',
+            help='Path to the csv file',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows written per transaction',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=available_cpus(),
+            help='Processes used for password hashing',
+        )
+        parser.add_argument(
+            '--update',
+            action='store_true',
+            help='Update users with the same email and username '
+                 'instead of skipping them',
+        )
+
+    def split(self, rows):
+        """Делит партию на новых, обновляемых и пропущенных
+        пользователей одним запросом."""
+        emails = {row['email'] for row in rows}
+        usernames = {row['username'] for row in rows}
+        existing = list(User.objects.filter(
+            Q(email__in=emails) | Q(username__in=usernames)))
+        by_email = {user.email: user for user in existing}
+        by_username = {user.username: user for user in existing}
+        new, updated, skipped = [], [], 0
+        # повторы внутри партии пропускаются так же, как существующие
+        emails, usernames = set(by_email), set(by_username)
+        for row in rows:
+            user = by_email.get(row['email'])
+            if row['email'] not in emails and row['username'] not in usernames:
+                new.append(row)
+                emails.add(row['email'])
+                usernames.add(row['username'])
+            elif (
+                self.update and user is not None
+                and user.username == row['username']
+            ):
+                updated.append((user, row))
+            else:
+                skipped += 1
+        return new, updated, skipped
+
+    def import_batch(self, pool, rows):
+        new, updated, skipped = self.split(rows)
+        rows_to_hash = new + [row for _, row in updated]
+        passwords = pool.map(
+            hash_password,
+            [row['password'] for row in rows_to_hash],
+            chunksize=max(1, len(rows_to_hash) // self.workers),
+        )
+        users = []
+        for row, password in zip(rows_to_hash, passwords):
+            user = User(password=password)
+            for field in PROFILE_FIELDS:
+                setattr(user, field, row[field])
+            users.append(user)
+        for (user, _), imported in zip(updated, users[len(new):]):
+            user.first_name = imported.first_name
+            user.last_name = imported.last_name
+            user.password = imported.password
+        with transaction.atomic():
+            User.objects.bulk_create(users[:len(new)], ignore_conflicts=True)
+            User.objects.bulk_update(
+                [user for user, _ in updated],
+                ('first_name', 'last_name', 'password'),
+            )
+        if updated:
+            users_updated.send(
+                sender=User, user_ids=[user.pk for user, _ in updated])
+        return len(new), len(updated), skipped
 
     def handle(self, *args, **options):
-        # Show this when the data already exist in the database
-        if User.objects.exists():
-            print('category data already loaded...exiting.')
-            print(ALREDY_LOADED_ERROR_MESSAGE)
-            return
-        # Show this before loading the data into the database
-        print("Loading users data")
-
-        # Code to load the data into database
-        for row in DictReader(open('./users.csv')):
-            user = User(username=row['username'], email=row['email'], first_name=row['first_name'], last_name=row['last_name'], password=row['password'])
-            user.save()
+        self.update, self.workers = options['update'], options['workers']
+        started = time.monotonic()
+        total = created = updated = skipped = 0
+        with open(options['path'], encoding='utf-8-sig', newline='') as file:
+            with ProcessPoolExecutor(
+                max_workers=self.workers, initializer=django.setup,
+            ) as pool:
+                for rows in batches(read_csv(file), options['batch_size']):
+                    counts = self.import_batch(pool, rows)
+                    total += len(rows)
+                    created += counts[0]
+                    updated += counts[1]
+                    skipped += counts[2]
+                    elapsed = time.monotonic() - started
+                    self.stdout.write(
+                        f'{total} rows read, {created} created, '
+                        f'{updated} updated, {skipped} skipped, '
+                        f'{total / elapsed:.0f} rows/s'
+                    )
+        self.stdout.write(self.style.SUCCESS(
+            f'Done in {time.monotonic() - started:.1f}s '
+            f'with {self.workers} workers'
+        ))
@@ -0,0 +1,47 @@
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+from recipes.models import ShoppingListItem
+from recipes.shopping_list import live_totals
+
+
+class Command(BaseCommand):
+    help = "Checks stored shopping lists against carts and rebuilds them"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Only report differences, do not write anything',
+        )
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        totals = {
+            (user, ingredient): total
+            for user, ingredient, total in live_totals().iterator()
+        }
+        stored = {
+            (user, ingredient): amount
+            for user, ingredient, amount in ShoppingListItem.objects.values_list(
+                'user', 'ingredient', 'amount').iterator()
+        }
+        wrong = {
+            key for key in totals.keys() | stored.keys()
+            if totals.get(key) != stored.get(key)
+        }
+        self.stdout.write(f'{len(wrong)} shopping list rows differ')
+        if options['check']:
+            if wrong:
+                raise CommandError('Shopping lists are out of sync')
+            return
+        if wrong:
+            ShoppingListItem.objects.all().delete()
+            ShoppingListItem.objects.bulk_create(
+                (
+                    ShoppingListItem(
+                        user_id=user, ingredient_id=ingredient, amount=total)
+                    for (user, ingredient), total in totals.items()
+                ),
+                batch_size=1000,
+            )
+        self.stdout.write(self.style.SUCCESS('Done'))
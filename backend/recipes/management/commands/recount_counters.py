@@ -0,0 +1,41 @@
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count
+from recipes.signals import COUNTERS
+
+
+class Command(BaseCommand):
+    help = "Checks stored counters against live data and repairs drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Only report drift, do not write anything',
+        )
+
+    def handle(self, *args, **options):
+        total_drift = 0
+        for model, field, source, fk in COUNTERS:
+            fk_attname = source._meta.get_field(fk).attname
+            actual = dict(
+                source.objects.order_by().values_list(fk_attname).annotate(
+                    total=Count('pk'))
+            )
+            drifted = []
+            with transaction.atomic():
+                rows = model.objects.select_for_update().only('pk', field)
+                for obj in rows.iterator():
+                    value = actual.get(obj.pk, 0)
+                    if getattr(obj, field) != value:
+                        setattr(obj, field, value)
+                        drifted.append(obj)
+                if drifted and not options['check']:
+                    model.objects.bulk_update(
+                        drifted, (field,), batch_size=1000)
+            total_drift += len(drifted)
+            self.stdout.write(
+                f'{model.__name__}.{field}: {len(drifted)} drifted')
+        if options['check'] and total_drift:
+            raise CommandError('Counters are out of sync')
+        self.stdout.write(self.style.SUCCESS('Done'))
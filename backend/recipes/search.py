@@ -0,0 +1,82 @@
+import re
+
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connections
+from django.db.models import F, Q
+from django.db.models.expressions import RawSQL
+
+SEARCH_CONFIG = 'russian'
+FTS_TABLE = 'recipes_recipe_fts'
+
+
+def get_vendor(queryset):
+    return connections[queryset.db].vendor
+
+
+def search_vector():
+    return (
+        SearchVector('name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector('text', weight='B', config=SEARCH_CONFIG)
+    )
+
+
+def index_recipes(queryset):
+    """Обновляет поисковый индекс для рецептов из queryset."""
+    vendor = get_vendor(queryset)
+    if vendor == 'postgresql':
+        queryset.update(search_vector=search_vector())
+    elif vendor == 'sqlite':
+        rows = list(queryset.values_list('id', 'name', 'text'))
+        with connections[queryset.db].cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                [(row[0],) for row in rows],
+            )
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, name, text) '
+                'VALUES (%s, %s, %s)',
+                rows,
+            )
+
+
+def unindex_recipe(recipe, using):
+    if connections[using].vendor == 'sqlite':
+        with connections[using].cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', (recipe.pk,))
+
+
+def search_recipes(queryset, value):
+    """Отбирает рецепты по запросу и сортирует их по релевантности.
+
+    Каждое слово запроса ищется как префикс, чтобы находить рецепты
+    по началу слова, пока оно набирается. На PostgreSQL используется
+    search_vector с GIN-индексом, на SQLite — таблица FTS5, на остальных
+    БД — поиск подстроки.
+    """
+    vendor = get_vendor(queryset)
+    terms = re.findall(r'\w+', value)
+    if not terms:
+        return queryset.none()
+    if vendor == 'postgresql':
+        query = SearchQuery(
+            ' & '.join(f'{term}:*' for term in terms),
+            config=SEARCH_CONFIG,
+            search_type='raw',
+        )
+        return queryset.filter(search_vector=query).annotate(
+            rank=SearchRank(F('search_vector'), query),
+        ).order_by('-rank', '-publication_date')
+    if vendor == 'sqlite':
+        match = ' '.join(f'"{term}"*' for term in terms)
+        table = queryset.model._meta.db_table
+        return queryset.filter(id__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+            (match,),
+        )).annotate(rank=RawSQL(
+            f'SELECT bm25({FTS_TABLE}, 10.0, 1.0) FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s AND rowid = {table}.id',
+            (match,),
+        )).order_by('rank', '-publication_date')
+    return queryset.filter(Q(name__icontains=value) | Q(text__icontains=value))
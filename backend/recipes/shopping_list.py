@@ -0,0 +1,72 @@
+from django.db import transaction
+from django.db.models import Sum
+from users.models import User
+
+from .models import IngredientsInRecipe, ShoppingCart, ShoppingListItem
+
+
+def live_totals(**filters):
+    """Суммы ингредиентов в корзинах, посчитанные по рецептам."""
+    return IngredientsInRecipe.objects.filter(
+        recipe__cart__isnull=False, **filters
+    ).order_by().values_list(
+        'recipe__cart__user', 'ingredients',
+    ).annotate(total=Sum('amount'))
+
+
+@transaction.atomic
+def refresh_shopping_lists(user_ids, ingredient_ids):
+    """Пересчитывает строки списков покупок только для переданных
+    пользователей и ингредиентов.
+
+    Пользователи блокируются в порядке id, поэтому параллельные
+    изменения одних и тех же списков выполняются по очереди.
+    """
+    user_ids, ingredient_ids = list(user_ids), list(ingredient_ids)
+    if not user_ids or not ingredient_ids:
+        return
+    list(
+        User.objects.select_for_update().filter(
+            pk__in=user_ids).order_by('pk').values_list('pk', flat=True)
+    )
+    totals = {
+        (user, ingredient): total
+        for user, ingredient, total in live_totals(
+            recipe__cart__user__in=user_ids,
+            ingredients__in=ingredient_ids,
+        )
+    }
+    stored = {
+        (item.user_id, item.ingredient_id): item
+        for item in ShoppingListItem.objects.filter(
+            user__in=user_ids, ingredient__in=ingredient_ids)
+    }
+    changed = []
+    for key, item in stored.items():
+        if key in totals and item.amount != totals[key]:
+            item.amount = totals[key]
+            changed.append(item)
+    ShoppingListItem.objects.bulk_update(changed, ('amount',))
+    ShoppingListItem.objects.filter(
+        pk__in=[
+            item.pk for key, item in stored.items() if key not in totals
+        ]
+    ).delete()
+    ShoppingListItem.objects.bulk_create([
+        ShoppingListItem(user_id=user, ingredient_id=ingredient, amount=total)
+        for (user, ingredient), total in totals.items()
+        if (user, ingredient) not in stored
+    ])
+
+
+def refresh_recipe_shopping_lists(recipe_id, ingredient_ids):
+    refresh_shopping_lists(
+        ShoppingCart.objects.filter(
+            recipes=recipe_id).values_list('user', flat=True),
+        ingredient_ids,
+    )
+
+
+def recipe_ingredient_ids(recipe_id):
+    return IngredientsInRecipe.objects.filter(
+        recipe=recipe_id).values_list('ingredients', flat=True)
@@ -0,0 +1,158 @@
+from django.db.models import F
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from users.models import Subscription, User
+
+from .bulk import collection_changed, recipe_ingredients_changed, recount
+from .feed import (backfill_followers, backfill_timeline,
+                   dropped_below_fanout_limit, push_recipe, trim_timeline)
+from .images import release_image, schedule_derivatives
+from .models import Favorite, IngredientsInRecipe, Recipe, ShoppingCart
+from .search import index_recipes, unindex_recipe
+from .shopping_list import (recipe_ingredient_ids,
+                            refresh_recipe_shopping_lists,
+                            refresh_shopping_lists)
+
+# (модель со счётчиком, поле счётчика, модель-источник, FK источника)
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipes'),
+    (Recipe, 'shopping_cart_count', ShoppingCart, 'recipes'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Subscription, 'author'),
+)
+
+
+def change_counter(model, field, pk, delta):
+    queryset = model.objects.filter(pk=pk)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def connect_counter(model, field, source, fk):
+    fk_attname = source._meta.get_field(fk).attname
+
+    def increment(sender, instance, created, **kwargs):
+        if created:
+            change_counter(model, field, getattr(instance, fk_attname), 1)
+
+    def decrement(sender, instance, **kwargs):
+        change_counter(model, field, getattr(instance, fk_attname), -1)
+
+    post_save.connect(increment, sender=source, weak=False)
+    post_delete.connect(decrement, sender=source, weak=False)
+
+
+for counter in COUNTERS:
+    connect_counter(*counter)
+
+
+def recipe_saved(sender, instance, using, update_fields, **kwargs):
+    if update_fields is not None and not {'name', 'text'} & update_fields:
+        return
+    index_recipes(Recipe.objects.using(using).filter(pk=instance.pk))
+
+
+def recipe_deleted(sender, instance, using, **kwargs):
+    unindex_recipe(instance, using)
+
+
+post_save.connect(recipe_saved, sender=Recipe)
+post_delete.connect(recipe_deleted, sender=Recipe)
+
+
+def cart_saved(sender, instance, created, **kwargs):
+    if created:
+        refresh_shopping_lists(
+            [instance.user_id], recipe_ingredient_ids(instance.recipes_id))
+
+
+def cart_deleting(sender, instance, **kwargs):
+    instance.ingredient_ids = list(recipe_ingredient_ids(instance.recipes_id))
+
+
+def cart_deleted(sender, instance, **kwargs):
+    refresh_shopping_lists(
+        [instance.user_id], getattr(instance, 'ingredient_ids', ()))
+
+
+def recipe_ingredient_changed(sender, instance, **kwargs):
+    refresh_recipe_shopping_lists(
+        instance.recipe_id, [instance.ingredients_id])
+
+
+def collection_bulk_changed(sender, user_id, recipe_ids, **kwargs):
+    recount(sender, recipe_ids)
+    if sender is ShoppingCart:
+        refresh_shopping_lists(
+            [user_id],
+            IngredientsInRecipe.objects.filter(
+                recipe__in=recipe_ids,
+            ).order_by().values_list('ingredients', flat=True).distinct(),
+        )
+
+
+def recipe_ingredients_bulk_changed(sender, recipe_id, ingredient_ids,
+                                    **kwargs):
+    refresh_recipe_shopping_lists(recipe_id, ingredient_ids)
+
+
+post_save.connect(cart_saved, sender=ShoppingCart)
+pre_delete.connect(cart_deleting, sender=ShoppingCart)
+post_delete.connect(cart_deleted, sender=ShoppingCart)
+post_save.connect(recipe_ingredient_changed, sender=IngredientsInRecipe)
+post_delete.connect(recipe_ingredient_changed, sender=IngredientsInRecipe)
+collection_changed.connect(collection_bulk_changed)
+recipe_ingredients_changed.connect(recipe_ingredients_bulk_changed)
+
+
+def recipe_published(sender, instance, created, **kwargs):
+    if created:
+        push_recipe(instance)
+
+
+def subscription_saved(sender, instance, created, **kwargs):
+    if created:
+        backfill_timeline(instance.user_id, instance.author_id)
+
+
+def subscription_deleted(sender, instance, **kwargs):
+    trim_timeline(instance.user_id, instance.author_id)
+    if dropped_below_fanout_limit(instance.author_id):
+        backfill_followers(instance.author_id)
+
+
+post_save.connect(recipe_published, sender=Recipe)
+post_save.connect(subscription_saved, sender=Subscription)
+post_delete.connect(subscription_deleted, sender=Subscription)
+
+
+def recipe_image_saved(sender, instance, update_fields, **kwargs):
+    if update_fields is None or 'image' in update_fields:
+        schedule_derivatives(instance.pk)
+
+
+post_save.connect(recipe_image_saved, sender=Recipe)
+
+
+def recipe_image_replacing(sender, instance, **kwargs):
+    # незафиксированный файл будет сохранён и получит свою ссылку
+    if instance.pk and not instance.image._committed:
+        instance.replaced_image = Recipe.objects.filter(
+            pk=instance.pk).values_list('image', flat=True).first()
+
+
+def recipe_image_replaced(sender, instance, **kwargs):
+    replaced_image = instance.__dict__.pop('replaced_image', None)
+    if replaced_image:
+        release_image(replaced_image)
+
+
+def recipe_image_deleted(sender, instance, **kwargs):
+    if instance.image.name:
+        release_image(instance.image.name)
+
+
+pre_save.connect(recipe_image_replacing, sender=Recipe)
+post_save.connect(recipe_image_replaced, sender=Recipe)
+post_delete.connect(recipe_image_deleted, sender=Recipe)
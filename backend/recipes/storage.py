@@ -0,0 +1,53 @@
+import hashlib
+import os
+
+from django.apps import apps
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.utils.deconstruct import deconstructible
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    return digest.hexdigest()
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранит файл под sha256 его содержимого.
+
+    Одинаковые загрузки попадают в один файл, а файл по однажды
+    выданному адресу никогда не меняется. Каждое сохранение учитывается
+    в StoredImage, а удаляет файл только `release_image`. Файлы, чья
+    запись в StoredImage откатилась вместе с транзакцией, убирает
+    команда `delete_orphaned_images`.
+    """
+
+    def content_name(self, name, content):
+        digest = content_hash(content)
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(directory, digest[:2], digest + extension)
+
+    def save(self, name, content, max_length=None):
+        stored_images = apps.get_model('recipes', 'StoredImage').objects
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.content_name(name, content)
+        with transaction.atomic():
+            stored, _ = stored_images.select_for_update().get_or_create(
+                name=name)
+            stored.references += 1
+            stored.save()
+            if self.exists(name):
+                return name
+            return super().save(name, content, max_length)
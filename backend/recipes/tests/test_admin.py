@@ -0,0 +1,72 @@
+from django.test import TestCase
+from recipes.models import (Favorite, Ingredients, IngredientsInRecipe, Recipe,
+                            ShoppingCart)
+from users.models import User
+
+# сессия, пользователь, COUNT и страница
+CHANGELIST_QUERIES = 4
+
+
+class AdminChangelistQueryBudgetTest(TestCase):
+    """Число запросов к БД на странице списка в админке не зависит от
+    числа строк на ней."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        authors = [
+            User.objects.create_user(
+                username=f'author{i}', email=f'author{i}@example.com',
+                password='pass',
+            )
+            for i in range(5)
+        ]
+        ingredients = [
+            Ingredients.objects.create(name=f'ingredient{i}',
+                                       measurement_unit='г')
+            for i in range(3)
+        ]
+        for i in range(10):
+            recipe = Recipe.objects.create(
+                author=authors[i % len(authors)],
+                name=f'recipe{i}',
+                text='text',
+                cooking_time=5,
+                image='recipes/images/image.png',
+            )
+            for ingredient in ingredients:
+                IngredientsInRecipe.objects.create(
+                    recipe=recipe, ingredients=ingredient, amount=1)
+            for author in authors:
+                Favorite.objects.create(user=author, recipes=recipe)
+                ShoppingCart.objects.create(user=author, recipes=recipe)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def assert_changelist_budget(self, url):
+        with self.assertNumQueries(CHANGELIST_QUERIES):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_recipe_changelist(self):
+        self.assert_changelist_budget('/admin/recipes/recipe/')
+
+    def test_recipe_changelist_author_filter(self):
+        self.assert_changelist_budget('/admin/recipes/recipe/?author=author1')
+
+    def test_favorite_changelist(self):
+        self.assert_changelist_budget('/admin/recipes/favorite/')
+
+    def test_favorite_changelist_search(self):
+        self.assert_changelist_budget('/admin/recipes/favorite/?q=author1')
+
+    def test_shopping_cart_changelist(self):
+        self.assert_changelist_budget('/admin/recipes/shoppingcart/')
+
+    def test_ingredients_in_recipe_changelist(self):
+        self.assert_changelist_budget('/admin/recipes/ingredientsinrecipe/')
+
+    def test_user_changelist(self):
+        self.assert_changelist_budget('/admin/users/user/')
@@ -0,0 +1,55 @@
+from django.test import TestCase, override_settings
+from recipes.feed import feed_recipes
+from recipes.models import Recipe
+from users.models import Subscription, User
+
+
+@override_settings(FEED_FANOUT_LIMIT=3)
+class FeedFanoutLimitTest(TestCase):
+    """Лента подписчика не теряет рецепты автора, число подписчиков
+    которого опустилось ниже FEED_FANOUT_LIMIT."""
+
+    def setUp(self):
+        self.author = User.objects.create_user(
+            username='author', email='author@example.com', password='pass')
+        self.followers = [
+            User.objects.create_user(
+                username=f'follower{i}', email=f'follower{i}@example.com',
+                password='pass',
+            )
+            for i in range(3)
+        ]
+
+    def subscribe(self, user):
+        Subscription.objects.create(user=user, author=self.author)
+
+    def feed(self, user):
+        return list(feed_recipes(Recipe.objects.all(), user).values_list(
+            'name', flat=True))
+
+    def test_followers_get_recipes_after_drop_below_limit(self):
+        first, second, third = self.followers
+        self.subscribe(first)
+        Recipe.objects.create(
+            author=self.author,
+            name='old',
+            text='text',
+            cooking_time=5,
+            image='recipes/images/image.png',
+        )
+        self.subscribe(second)
+        self.subscribe(third)
+        Recipe.objects.create(
+            author=self.author,
+            name='new',
+            text='text',
+            cooking_time=5,
+            image='recipes/images/image.png',
+        )
+        self.assertCountEqual(self.feed(third), ['old', 'new'])
+
+        Subscription.objects.get(user=second, author=self.author).delete()
+
+        self.assertCountEqual(self.feed(first), ['old', 'new'])
+        self.assertCountEqual(self.feed(third), ['old', 'new'])
+        self.assertEqual(self.feed(second), [])
@@ -0,0 +1,52 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+from recipes.models import Recipe, StoredImage
+
+
+class DeleteOrphanedImagesTest(TestCase):
+    """Файл, записанный в откаченной транзакции, удаляется командой
+    delete_orphaned_images, а файлы со ссылками остаются."""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.storage = Recipe._meta.get_field('image').storage
+
+    def save(self, content):
+        return self.storage.save(
+            'recipes/images/image.png', ContentFile(content))
+
+    def test_rolled_back_file_is_deleted(self):
+        kept = self.save(b'kept')
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                orphan = self.save(b'orphan')
+                raise RuntimeError
+        self.assertTrue(self.storage.exists(orphan))
+        self.assertFalse(StoredImage.objects.filter(name=orphan).exists())
+
+        call_command(
+            'delete_orphaned_images', min_age=0, stdout=StringIO())
+
+        self.assertFalse(self.storage.exists(orphan))
+        self.assertTrue(self.storage.exists(kept))
+        self.assertFalse(StoredImage.objects.filter(name=orphan).exists())
+
+    def test_recent_files_are_kept(self):
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                orphan = self.save(b'orphan')
+                raise RuntimeError
+
+        call_command('delete_orphaned_images', stdout=StringIO())
+
+        self.assertTrue(self.storage.exists(orphan))
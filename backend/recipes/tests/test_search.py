@@ -0,0 +1,49 @@
+from django.test import TestCase
+from recipes.models import Recipe
+from rest_framework.test import APIClient
+from users.models import User
+
+
+class RecipeSearchTest(TestCase):
+    """Поиск находит рецепты по началу слова."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        for name, text in (('Борщ', 'Свёкла и капуста'),
+                           ('Каша', 'Овсянка на молоке')):
+            Recipe.objects.create(
+                author=cls.admin,
+                name=name,
+                text=text,
+                cooking_time=5,
+                image='recipes/images/image.png',
+            )
+
+    def search(self, value):
+        response = APIClient().get('/api/recipes/', {'search': value})
+        self.assertEqual(response.status_code, 200)
+        return [recipe['name'] for recipe in response.data['results']]
+
+    def test_whole_word(self):
+        self.assertEqual(self.search('борщ'), ['Борщ'])
+
+    def test_word_prefix(self):
+        self.assertEqual(self.search('бор'), ['Борщ'])
+        self.assertEqual(self.search('овс мол'), ['Каша'])
+
+    def test_no_match(self):
+        self.assertEqual(self.search('суп'), [])
+
+    def test_admin_autocomplete_prefix(self):
+        self.client.force_login(self.admin)
+        response = self.client.get('/admin/autocomplete/', {
+            'app_label': 'recipes',
+            'model_name': 'ingredientsinrecipe',
+            'field_name': 'recipe',
+            'term': 'бор',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [item['text'] for item in response.json()['results']], ['Борщ'])
@@ -1,9 +1,17 @@
 from django.contrib import admin
+from recipes.admin import LargeTableAdmin
 from users.models import User
 
 
 @admin.register(User)
-class UserAdmin(admin.ModelAdmin):
-    list_display = ('username', 'email', 'first_name', 'last_name')
-    search_fields = ('email',)
+class UserAdmin(LargeTableAdmin):
+    list_display = (
+        'username',
+        'email',
+        'first_name',
+        'last_name',
+        'recipes_count',
+        'followers_count',
+    )
+    search_fields = ('username', 'email',)
     empty_value_display = '-пусто-'
@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+# bulk_update не вызывает post_save, поэтому команда import_users
+# сообщает этим сигналом об обновлённых пользователях
+users_updated = Signal()